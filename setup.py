@@ -47,6 +47,7 @@ setuptools.setup(
     },
     include_package_data=True,
     install_requires=requirements,
+    extras_require={'zstd': ['zstandard'], 'numpy': ['numpy']},
     tests_require=requirements_test,
     entry_points={"pytest11": ["tesla_ce_provider_fixtures=tesla_ce_provider_fixtures.fixtures"]}
 )
@@ -13,15 +13,22 @@
 #      You should have received a copy of the GNU Affero General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Provider Package """
-from .celery_app import app as celery_app
-from .celery_app import client
-from .provider import (
-    BaseProvider,
-    audit,
-    result,
-)
-from . import tasks
+import importlib
+import sys
+import types
 
+#: Public names of the package, imported on first access: name -> (module, attribute)
+_LAZY_ATTRIBUTES = {
+    "celery_app": (".celery_app", "app"),
+    "client": (".celery_app", "client"),
+    "BaseProvider": (".provider", "BaseProvider"),
+    "audit": (".provider", "audit"),
+    "result": (".provider", "result"),
+    "tasks": (".tasks", None),
+}
+
+# Celery looks for an app attribute when started with "-A tesla_ce_provider"
+_LAZY_ATTRIBUTES["app"] = _LAZY_ATTRIBUTES["celery_app"]
 
 __all__ = [
     "celery_app",
@@ -30,4 +37,37 @@ __all__ = [
     "audit",
     "result",
     "tasks",
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """
+        Import the public names of the package on first access, so using a part of the package does not load Celery,
+        the TeSLA CE client and the tasks
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module_name, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    if name != 'client':
+        globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+class _Package(types.ModuleType):
+    """
+        Package module keeping celery_app bound to the Celery app when the celery_app module is imported
+    """
+    def __setattr__(self, name, value):
+        if name == 'celery_app' and isinstance(value, types.ModuleType):
+            value = value.app
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -0,0 +1,270 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider in-process cache module """
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedValue:
+    """
+        Process-local value that is loaded on first access and refreshed after a time to live. When several threads
+        find the value expired at the same time, only one of them performs the refresh.
+    """
+
+    def __init__(self, ttl):
+        """
+            Create a cached value
+
+            :param ttl: Time to live of the value in seconds. Values lower or equal to zero disable the cache.
+            :type ttl: float
+        """
+        self.ttl = ttl
+        self._value = None
+        self._expires = None
+        self._lock = threading.Lock()
+
+    def _is_valid(self):
+        """
+            Check if current value can be used
+            :return: True if the value is loaded and not expired
+            :rtype: bool
+        """
+        return self._expires is not None and time.monotonic() < self._expires
+
+    def get(self, loader):
+        """
+            Get the value, loading it if it is not available or it is expired
+
+            :param loader: Function without arguments that returns a fresh value
+            :type loader: callable
+            :return: Cached value
+        """
+        if self._is_valid():
+            return self._value
+        with self._lock:
+            if not self._is_valid():
+                value = loader()
+                self._value = value
+                if self.ttl > 0:
+                    self._expires = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self):
+        """
+            Discard current value. Next access will load a fresh value.
+        """
+        with self._lock:
+            self._value = None
+            self._expires = None
+
+
+class LRUCache:
+    """
+        Process-local least recently used cache with a memory budget. The size of each entry is provided by the
+        caller, and least recently used entries are evicted when the total size exceeds the budget.
+    """
+
+    def __init__(self, max_size):
+        """
+            Create a cache
+
+            :param max_size: Maximum total size of the entries in bytes. Zero disables the cache.
+            :type max_size: int
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+            Get an entry from the cache
+
+            :param key: Entry key
+            :return: Cached value, or None if key is not in the cache
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """
+            Add an entry to the cache. Entries larger than the budget are not stored.
+
+            :param key: Entry key
+            :param value: Value to store
+            :param size: Size of the value in bytes
+            :type size: int
+        """
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[1]
+                self.evictions += 1
+
+    def invalidate(self, match=None):
+        """
+            Remove entries from the cache
+
+            :param match: Function that receives a key and returns True if the entry must be removed. If not
+                          provided, all the entries are removed.
+            :type match: callable
+        """
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if match is None or match(key):
+                    self._size -= self._entries.pop(key)[1]
+
+    def stats(self):
+        """
+            Get cache usage counters
+            :return: Counters of the cache
+            :rtype: dict
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size': self._size,
+                'max_size': self.max_size
+            }
+
+
+class _Flight:
+    """
+        Call in progress for a key of a single-flight group
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+        Process-local group of calls where concurrent calls for the same key are merged. The first caller performs
+        the call, and callers arriving while it is in progress wait for it and receive the same result or exception.
+        Waiters are counted per key, for the most recently used max_keys keys.
+    """
+
+    def __init__(self, max_keys=1024):
+        """
+            Create a single-flight group
+
+            :param max_keys: Maximum number of keys with counters
+            :type max_keys: int
+        """
+        self.max_keys = max_keys
+        self._flights = {}
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def _count(self, key, flight, leader):
+        """
+            Update the counters of a key. Must be called with the lock held.
+
+            :param key: Call key
+            :param flight: Call in progress for the key
+            :type flight: _Flight
+            :param leader: Whether the caller performs the call
+            :type leader: bool
+        """
+        counters = self._keys.pop(key, None)
+        if counters is None:
+            counters = {'calls': 0, 'waiters': 0, 'max_waiters': 0}
+        if leader:
+            self.calls += 1
+            counters['calls'] += 1
+        else:
+            self.shared += 1
+            counters['waiters'] += 1
+            counters['max_waiters'] = max(counters['max_waiters'], flight.waiters)
+        self._keys[key] = counters
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+
+    def do(self, key, call):
+        """
+            Perform a call, or wait for the call in progress for the same key
+
+            :param key: Call key
+            :param call: Function without arguments performing the call
+            :type call: callable
+            :return: Value returned by the call
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                flight.waiters += 1
+            self._count(key, flight, leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = call()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        """
+            Get call counters
+            :return: Number of calls performed (calls), calls that waited for another one (shared), calls in
+                     progress (in_flight), and counters per key (keys) with the calls performed (calls), the calls
+                     that waited (waiters) and the maximum number of concurrent waiters (max_waiters)
+            :rtype: dict
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._flights),
+                'keys': {key: dict(counters) for key, counters in self._keys.items()},
+            }
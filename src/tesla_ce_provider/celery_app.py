@@ -14,54 +14,134 @@
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ Celery client module """
 import os
+import threading
 from celery import Celery
+from celery.signals import celeryd_init, worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from celery.utils.log import get_logger
 from kombu import Exchange, Queue
 from tesla_ce_client import Client, exception
+from . import config
+from . import storage
+from .provider import registry
+from .shared_arrays import release_shared_arrays
 
-client = None
-try:
-    if os.getenv("SSL_VERIFY") in ['0', 0, 'False', 'false']:
-        client = Client(verify_ssl=False)
-    else:
-        client = Client()
-except exception.TeslaConfigException as tce:
-    # Enforce valid configuration except when DEBUG is enabled
-    if os.getenv('DEBUG', False) not in [1, '1', True, 'True', 'true']:
-        raise tce
-
-
-app = Celery('tesla_ce_provider')
-
-# Using a string here means the worker doesn't have to serialize
-# the configuration object to child processes.
-# - namespace='CELERY' means all celery-related configuration keys
-#   should have a `CELERY_` prefix.
-if client is not None:
-    # Allow customize host and port
-    custom_host = os.getenv('CELERY_BROKER_HOST', None)
-    custom_port = os.getenv('CELERY_BROKER_PORT', None)
-    if custom_host is not None:
-        client.config['CELERY_BROKER_HOST'] = custom_host
-    if custom_port is not None:
-        client.config['CELERY_BROKER_PORT'] = custom_port
-
-    app.config_from_object(client.config, namespace='CELERY')
-
-# Get the queues to consume from
-if client is not None and client.module:
-    queues = client.module['provider_queue']
-    queues = queues.replace(' ', '').split(',')
-
-    # Create the Queues
-    queue_list = tuple()
-    with app.broker_connection() as connection:
-        channel = connection.default_channel
-        for queue in queues:
-            queue_name = queue
-            new_queue = Queue(queue_name,
-                              exchange=Exchange(queue_name, type='direct', connection=connection),
-                              routing_key=queue_name)
-            new_queue(channel).declare()
-            queue_list += (new_queue, )
-
-    app.conf.task_queues = queue_list
+#: TeSLA CE API client, created on first use
+_client = None
+
+#: Whether the client creation was already attempted
+_client_created = False
+
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+        Get the TeSLA CE API client of this process. It is created on first use, so importing the package does not
+        perform any request. When the configuration is not valid, None is returned if DEBUG is enabled.
+
+        :return: Client instance
+        :rtype: tesla_ce_client.Client
+    """
+    global _client, _client_created
+    if not _client_created:
+        with _client_lock:
+            if not _client_created:
+                try:
+                    if os.getenv("SSL_VERIFY") in ['0', 0, 'False', 'false']:
+                        _client = Client(verify_ssl=False)
+                    else:
+                        _client = Client()
+                except exception.TeslaConfigException as tce:
+                    # Enforce valid configuration except when DEBUG is enabled
+                    if os.getenv('DEBUG', False) not in [1, '1', True, 'True', 'true']:
+                        raise tce
+                _client_created = True
+    return _client
+
+
+def __getattr__(name):
+    """
+        Create the client when the client attribute of the module is accessed
+    """
+    if name == 'client':
+        return get_client()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+# Tasks are imported by the worker, as importing them loads the configuration
+app = Celery('tesla_ce_provider', include=['tesla_ce_provider.tasks'])
+
+
+@app.on_configure.connect
+def configure_app(sender, **kwargs):
+    """
+        Load Celery configuration from the TeSLA CE API the first time the configuration is accessed
+    """
+    client = get_client()
+    # Using a string here means the worker doesn't have to serialize
+    # the configuration object to child processes.
+    # - namespace='CELERY' means all celery-related configuration keys
+    #   should have a `CELERY_` prefix.
+    if client is not None:
+        # Allow customize host and port
+        custom_host = os.getenv('CELERY_BROKER_HOST', None)
+        custom_port = os.getenv('CELERY_BROKER_PORT', None)
+        if custom_host is not None:
+            client.config['CELERY_BROKER_HOST'] = custom_host
+        if custom_port is not None:
+            client.config['CELERY_BROKER_PORT'] = custom_port
+
+        sender.config_from_object(client.config, namespace='CELERY')
+
+
+@celeryd_init.connect
+def declare_queues(**kwargs):
+    """
+        Declare the queues to consume from when the worker starts, before it sets up its consumers
+    """
+    # Get the queues to consume from
+    client = get_client()
+    if client is not None and client.module:
+        queues = client.module['provider_queue']
+        queues = queues.replace(' ', '').split(',')
+
+        # Create the Queues
+        queue_list = tuple()
+        with app.broker_connection() as connection:
+            channel = connection.default_channel
+            for queue in queues:
+                queue_name = queue
+                new_queue = Queue(queue_name,
+                                  exchange=Exchange(queue_name, type='direct', connection=connection),
+                                  routing_key=queue_name)
+                new_queue(channel).declare()
+                queue_list += (new_queue, )
+
+        app.conf.task_queues = queue_list
+
+
+@worker_process_init.connect
+def reset_storage_session(**kwargs):
+    """
+        Discard storage connections inherited from the parent worker process
+    """
+    storage.reset_session()
+
+
+@worker_init.connect
+def preload_provider(**kwargs):
+    """
+        Load the provider in the parent worker process before the pool processes are forked, if PROVIDER_PRELOAD is
+        enabled
+    """
+    if config.get_bool('PROVIDER_PRELOAD', False):
+        get_logger(__name__).info('Provider preloaded in {:.2f} seconds'.format(registry.preload_provider()))
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def release_arrays(**kwargs):
+    """
+        Release the shared arrays used by the worker process that is shutting down
+    """
+    release_shared_arrays()
@@ -0,0 +1,84 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider configuration module """
+import os
+
+
+def get_int(key, default):
+    """
+        Read an integer value from environment
+
+        :param key: Environment variable name
+        :type key: str
+        :param default: Default value
+        :type default: int
+        :return: Configured value
+        :rtype: int
+    """
+    value = os.getenv(key, None)
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+def get_float(key, default):
+    """
+        Read a float value from environment
+
+        :param key: Environment variable name
+        :type key: str
+        :param default: Default value
+        :type default: float
+        :return: Configured value
+        :rtype: float
+    """
+    value = os.getenv(key, None)
+    if value is None or value == '':
+        return default
+    return float(value)
+
+
+def get_bool(key, default):
+    """
+        Read a boolean value from environment
+
+        :param key: Environment variable name
+        :type key: str
+        :param default: Default value
+        :type default: bool
+        :return: Configured value
+        :rtype: bool
+    """
+    value = os.getenv(key, None)
+    if value is None or value == '':
+        return default
+    return value in ['1', 'True', 'true', 'yes']
+
+
+def get_int_list(key, default):
+    """
+        Read a comma separated list of integers from environment
+
+        :param key: Environment variable name
+        :type key: str
+        :param default: Default value
+        :type default: list
+        :return: Configured value
+        :rtype: list
+    """
+    value = os.getenv(key, None)
+    if value is None or value == '':
+        return default
+    return [int(item) for item in value.split(',') if item.strip() != '']
@@ -0,0 +1,69 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider task context module """
+import contextvars
+
+
+class TaskContext:
+    """
+        State of a task invocation. Each invocation has its own context, so tasks running concurrently in the same
+        process, as in threads or gevent pools, do not share their state.
+    """
+
+    def __init__(self):
+        #: Learner the task is working on
+        self.learner = None
+
+        #: Whether the learner model must be unlocked in case of failure
+        self.unlock_on_failure = False
+
+        #: Notification tasks scheduled by the provider
+        self.notifications = []
+
+        #: Delayed results scheduled by the provider
+        self.delayed_results = []
+
+
+#: Context of current task invocation
+_current = contextvars.ContextVar('tesla_ce_task_context', default=None)
+
+
+def get_context():
+    """
+        Get the context of current task invocation
+
+        :return: Task context, or None if no task is running
+        :rtype: TaskContext
+    """
+    return _current.get()
+
+
+def start_context():
+    """
+        Create a new context for a task invocation and make it current
+
+        :return: Task context
+        :rtype: TaskContext
+    """
+    context = TaskContext()
+    _current.set(context)
+    return context
+
+
+def end_context():
+    """
+        Discard the context of current task invocation
+    """
+    _current.set(None)
@@ -13,6 +13,155 @@
 #      You should have received a copy of the GNU Affero General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Base Provider base model module """
+import binascii
+import io
+import re
+from urllib.parse import unquote_to_bytes
+from ..streamed import StreamedData, get_spool_file
+
+#: Size of the chunks of base64 content decoded to files
+_DECODE_CHUNK_SIZE = 4 * 1024 * 1024
+
+#: Characters that are not part of base64 content
+_NOT_BASE64 = re.compile(rb'[^A-Za-z0-9+/=]')
+
+
+def _get_string(data, key='data'):
+    """
+        Get a string value from a payload, decoding it if it was received as streamed data. Decoded value replaces
+        the streamed data, so the raw content is released. Binary data is provided as a base64 data URL.
+
+        :param data: Sample or request payload
+        :type data: dict
+        :param key: Key of the value
+        :type key: str
+        :return: String value
+        :rtype: str
+    """
+    value = data[key]
+    if isinstance(value, StreamedData):
+        data[key] = value.decode()
+        value.close()
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        # Binary data is kept, and encoded for providers expecting a data URL
+        mimetype = None
+        if data.get('metadata') is not None:
+            mimetype = data['metadata'].get('mimetype')
+        return 'data:{};base64,{}'.format(mimetype or 'application/octet-stream',
+                                          binascii.b2a_base64(value, newline=False).decode('ascii'))
+    return data[key]
+
+
+def _split_data_url(value):
+    """
+        Split a data URL in its header and its content. Values without data URL header are considered base64
+        encoded content. The content of a memoryview is a view of the same buffer, while the content of a string is
+        a copy, as strings do not support views.
+
+        :param value: Data URL
+        :type value: str | memoryview
+        :return: Tuple with the mimetype, whether the content is base64 encoded, and the content
+        :rtype: tuple
+    """
+    prefix = value[:5]
+    if not isinstance(prefix, str):
+        prefix = bytes(prefix).decode('ascii', errors='replace')
+    if prefix != 'data:':
+        return None, True, value
+    # Header is short, avoid searching the comma in the content
+    header = value[5:1024]
+    if not isinstance(header, str):
+        header = bytes(header).decode('ascii', errors='replace')
+    separator = header.find(',')
+    if separator < 0:
+        return None, True, value
+    params = header[:separator].split(';')
+    mimetype = params[0] or None
+    return mimetype, 'base64' in params[1:], value[5 + separator + 1:]
+
+
+def _decode_data_url(value):
+    """
+        Decode a data URL. Streamed data without escape sequences is decoded from its raw buffer, without creating
+        intermediate strings. The content of string values is copied once to remove the header.
+
+        :param value: Data URL, or binary data that does not need decoding
+        :type value: str | StreamedData | bytes
+        :return: Tuple with the mimetype and the decoded content
+        :rtype: tuple
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return None, value
+    if isinstance(value, StreamedData):
+        if value.escaped:
+            return _decode_data_url(value.decode())
+        with value.getbuffer() as view:
+            mimetype, is_base64, content = _split_data_url(view)
+            try:
+                if is_base64:
+                    return mimetype, binascii.a2b_base64(content)
+                return mimetype, unquote_to_bytes(bytes(content))
+            finally:
+                if isinstance(content, memoryview):
+                    content.release()
+    mimetype, is_base64, content = _split_data_url(value)
+    if is_base64:
+        return mimetype, binascii.a2b_base64(content)
+    return mimetype, unquote_to_bytes(content)
+
+
+def _get_data_url_mimetype(value):
+    """
+        Get the mime type in the header of a data URL, without decoding its content
+
+        :param value: Data URL, or binary data without header
+        :type value: str | StreamedData | bytes
+        :return: Mime type, or None if it is not available
+        :rtype: str
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return None
+    if isinstance(value, StreamedData):
+        with value.getbuffer() as view:
+            header = bytes(view[:1024]).decode('ascii', errors='replace')
+        if value.escaped:
+            header = header.replace('\\/', '/')
+        return _split_data_url(header)[0]
+    return _split_data_url(value[:1024])[0]
+
+
+def _decode_data_url_file(value):
+    """
+        Decode a spooled data URL to a temporary file, in chunks, so the decoded content is never fully loaded in
+        memory
+
+        :param value: Spooled data URL without escape sequences
+        :type value: StreamedData
+        :return: Temporary file with the decoded content
+        :rtype: tempfile.NamedTemporaryFile
+    """
+    output = get_spool_file()
+    with value.getbuffer() as view:
+        mimetype, is_base64, content = _split_data_url(view)
+        try:
+            if not is_base64:
+                output.write(unquote_to_bytes(bytes(content)))
+            else:
+                pending = b''
+                for pos in range(0, len(content), _DECODE_CHUNK_SIZE):
+                    chunk = pending + _NOT_BASE64.sub(b'', bytes(content[pos:pos + _DECODE_CHUNK_SIZE]))
+                    # Base64 content is decoded in blocks of 4 characters
+                    usable = len(chunk) - len(chunk) % 4
+                    output.write(binascii.a2b_base64(chunk[:usable]))
+                    pending = chunk[usable:]
+                if len(pending) > 0:
+                    output.write(binascii.a2b_base64(pending))
+        finally:
+            if isinstance(content, memoryview):
+                content.release()
+    output.flush()
+    output.seek(0)
+    return output
 
 
 class Sample:
@@ -30,6 +179,12 @@ class Sample:
         else:
             self._object = object
 
+        #: Decoded data URL, loaded on first access
+        self._data_url = None
+
+        #: Data as a string, loaded on first access
+        self._data_string = None
+
     @property
     def learner_id(self):
         """
@@ -66,13 +221,14 @@ class Sample:
     @property
     def data(self):
         """
-            Get sample data
+            Get sample data. Binary data is encoded once and kept by this object.
             :return: The base64 codification of the sample as provided by sensors
             :rtype: str
         """
-        if self._object is not None and 'data' in self._object and 'data' in self._object['data']:
-            return self._object['data']['data']
-        return None
+        if self._data_string is None and self._object is not None and 'data' in self._object and \
+                'data' in self._object['data']:
+            self._data_string = _get_string(self._object['data'])
+        return self._data_string
 
     @property
     def context(self):
@@ -118,6 +274,57 @@ class Sample:
             return self.metadata['mimetype']
         return None
 
+    def _get_data_url(self):
+        """
+            Get the decoded data URL of the sample
+            :return: Tuple with the mimetype and the decoded content, or None if there is no data
+            :rtype: tuple
+        """
+        if self._data_url is None and self._object is not None and 'data' in self._object and \
+                'data' in self._object['data'] and self._object['data']['data'] is not None:
+            self._data_url = _decode_data_url(self._object['data']['data'])
+        return self._data_url
+
+    @property
+    def data_bytes(self):
+        """
+            Get sample data decoded from its data URL, or as received when it was stored as binary data. Data is
+            decoded once and kept by this object.
+            :return: Decoded sample data
+            :rtype: bytes
+        """
+        data_url = self._get_data_url()
+        if data_url is None:
+            return None
+        return data_url[1]
+
+    @property
+    def data_view(self):
+        """
+            Get a read-only view of the decoded sample data, without copying it
+            :return: Decoded sample data
+            :rtype: memoryview
+        """
+        data = self.data_bytes
+        if data is None:
+            return None
+        return memoryview(data)
+
+    @property
+    def data_mimetype(self):
+        """
+            Get the mime type of the sample data. Mime type in the data URL is used when available, and the one
+            in the metadata otherwise.
+            :return: Data mime type
+            :rtype: str
+        """
+        if self._object is not None and 'data' in self._object and 'data' in self._object['data'] and \
+                self._object['data']['data'] is not None:
+            mimetype = _get_data_url_mimetype(self._object['data']['data'])
+            if mimetype is not None:
+                return mimetype
+        return self.mime_type
+
 
 class Request:
     """
@@ -134,6 +341,15 @@ class Request:
         else:
             self._object = object
 
+        #: Decoded data URL, loaded on first access
+        self._data_url = None
+
+        #: Data as a string, loaded on first access
+        self._data_string = None
+
+        #: File with the decoded data, created on first access
+        self._data_file = None
+
     @property
     def request_id(self):
         """
@@ -192,13 +408,14 @@ class Request:
     @property
     def data(self):
         """
-            Get request data
+            Get request data. Binary data is encoded once and kept by this object.
             :return: The base64 codification of the sample as provided by sensors
             :rtype: str
         """
-        if self._object is not None and 'data' in self._object and 'data' in self._object['data']:
-            return self._object['data']['data']
-        return None
+        if self._data_string is None and self._object is not None and 'data' in self._object and \
+                'data' in self._object['data']:
+            self._data_string = _get_string(self._object['data'])
+        return self._data_string
 
     @property
     def context(self):
@@ -244,6 +461,89 @@ class Request:
             return self.metadata['mimetype']
         return None
 
+    def _get_data_url(self):
+        """
+            Get the decoded data URL of the request
+            :return: Tuple with the mimetype and the decoded content, or None if there is no data
+            :rtype: tuple
+        """
+        if self._data_url is None and self._object is not None and 'data' in self._object and \
+                'data' in self._object['data'] and self._object['data']['data'] is not None:
+            self._data_url = _decode_data_url(self._object['data']['data'])
+        return self._data_url
+
+    @property
+    def data_bytes(self):
+        """
+            Get request data decoded from its data URL, or as received when it was stored as binary data. Data is
+            decoded once and kept by this object.
+            :return: Decoded request data
+            :rtype: bytes
+        """
+        data_url = self._get_data_url()
+        if data_url is None:
+            return None
+        return data_url[1]
+
+    @property
+    def data_view(self):
+        """
+            Get a read-only view of the decoded request data, without copying it
+            :return: Decoded request data
+            :rtype: memoryview
+        """
+        data = self.data_bytes
+        if data is None:
+            return None
+        return memoryview(data)
+
+    @property
+    def data_mimetype(self):
+        """
+            Get the mime type of the request data. Mime type in the data URL is used when available, and the one
+            in the metadata otherwise.
+            :return: Data mime type
+            :rtype: str
+        """
+        if self._object is not None and 'data' in self._object and 'data' in self._object['data'] and \
+                self._object['data']['data'] is not None:
+            mimetype = _get_data_url_mimetype(self._object['data']['data'])
+            if mimetype is not None:
+                return mimetype
+        return self.mime_type
+
+    @property
+    def data_file(self):
+        """
+            Get the decoded request data as a seekable binary file. When the request data was spooled to a temporary
+            file, it is decoded to another temporary file, which name can be given to external tools. Otherwise,
+            decoded data is provided as an in-memory file.
+            :return: Decoded request data
+            :rtype: file
+        """
+        if self._data_file is None:
+            value = None
+            if self._object is not None and 'data' in self._object and 'data' in self._object['data']:
+                value = self._object['data']['data']
+            if isinstance(value, StreamedData) and value.spooled and not value.escaped:
+                self._data_file = _decode_data_url_file(value)
+            elif self.data_bytes is not None:
+                self._data_file = io.BytesIO(self.data_bytes)
+        return self._data_file
+
+    def close(self):
+        """
+            Release the decoded request data and any temporary file used to store it
+        """
+        if self._data_file is not None:
+            self._data_file.close()
+            self._data_file = None
+        self._data_url = None
+        self._data_string = None
+        if self._object is not None and 'data' in self._object and \
+                isinstance(self._object['data'].get('data'), StreamedData):
+            self._object['data']['data'].close()
+
 
 class ValidationData:
     """
@@ -13,12 +13,44 @@
 #      You should have received a copy of the GNU Affero General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Base Provider package """
-from .base import BaseProvider
-from . import audit
-from . import result
+import importlib
+
+#: Public names of the package, imported on first access: name -> (module, attribute)
+_LAZY_ATTRIBUTES = {
+    "BaseProvider": (".base", "BaseProvider"),
+    "get_provider": (".registry", "get_provider"),
+    "get_provider_footprint": (".registry", "get_provider_footprint"),
+    "preload_provider": (".registry", "preload_provider"),
+    "reset_provider": (".registry", "reset_provider"),
+    "result": (".result", None),
+    "audit": (".audit", None),
+}
 
 __all__ = [
     "BaseProvider",
+    "get_provider",
+    "get_provider_footprint",
+    "preload_provider",
+    "reset_provider",
     "result",
     "audit",
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """
+        Import the public names of the package on first access, so the result and audit classes can be used without
+        loading the provider base class and its dependencies
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module_name, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
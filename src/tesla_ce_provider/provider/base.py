@@ -14,7 +14,10 @@
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Base Provider module """
 import os
+import re
 from .. import models
+from ..context import get_context
+from ..shared_arrays import get_shared_array_store
 
 
 class BaseProvider:
@@ -27,10 +30,10 @@ class BaseProvider:
     _credentials = {}
 
     def __init__(self):
-        #: Notification tasks
+        #: Notification tasks scheduled outside tasks. Tasks keep them in their context.
         self._notifications = []
 
-        #: DelayedResults tasks
+        #: DelayedResults tasks scheduled outside tasks. Tasks keep them in their context.
         self._delayed_results = []
 
         #: Provider ID
@@ -71,15 +74,14 @@ class BaseProvider:
         self._credentials[key] = value
 
     @staticmethod
-    def get_provider(provider=None):
+    def get_provider_class(provider=None):
         """
-            Create an instance of the provider
+            Get the class of the provider
             :param provider: Full class name for the provider
             :type provider: str
-            :return: Provider instance
-            :rtype: BaseProvider
+            :return: Provider class
+            :rtype: type
         """
-        # Get the provider class
         if provider is None:
             provider = os.getenv('PROVIDER_CLASS', None)
         if provider is None:
@@ -88,7 +90,45 @@ class BaseProvider:
         mod = __import__(components[0])
         for comp in components[1:]:
             mod = getattr(mod, comp)
-        return mod()
+        return mod
+
+    @staticmethod
+    def get_provider(provider=None):
+        """
+            Create an instance of the provider
+            :param provider: Full class name for the provider
+            :type provider: str
+            :return: Provider instance
+            :rtype: BaseProvider
+        """
+        return BaseProvider.get_provider_class(provider)()
+
+    @classmethod
+    def preload(cls):
+        """
+            Load heavy, read-only resources of the provider, like network weights, and keep them at class level so
+            all the instances use them. When PROVIDER_PRELOAD is enabled, it is called in the parent worker process
+            before the pool processes are forked, so they share the resources copy-on-write. Resources must not be
+            modified after they are loaded. By default, nothing is loaded.
+        """
+        pass
+
+    @classmethod
+    def get_shared_array(cls, name, loader):
+        """
+            Get a named read-only array shared by all the provider processes of the node, like embedding models or
+            projection bases. The first process calls the loader and publishes the array, and the rest attach to it
+            without copying it. Arrays are released when the worker processes shut down. Names are scoped to the
+            provider class, so providers running in the same node never share arrays.
+            :param name: Array name. It can contain letters, digits, dots, hyphens and underscores.
+            :type name: str
+            :param loader: Function without arguments that returns the array
+            :type loader: callable
+            :return: Read-only array
+            :rtype: numpy.ndarray
+        """
+        namespace = re.sub(r'[^A-Za-z0-9_.-]', '_', '{}.{}'.format(cls.__module__, cls.__qualname__))
+        return get_shared_array_store().get('{}.{}'.format(namespace, name), loader)
 
     def set_logger(self, logger):
         """
@@ -125,6 +165,26 @@ class BaseProvider:
         """
         raise NotImplementedError('Method not implemented on provider')
 
+    def precheck(self, request):
+        """
+            Check a verification request before the learner model is loaded. Providers can implement this method
+            to reject requests with checks that do not require the model (i.e. black images or invalid mimetypes),
+            avoiding the download of the model.
+            :param request: Verification request
+            :type request: tesla_ce_provider.models.base.Request
+            :return: Final verification result, or None if the request must be verified with the model
+            :rtype: tesla_ce_provider.result.VerificationResult
+        """
+        return None
+
+    def has_precheck(self):
+        """
+            Check if this provider implements the verification pre-check
+            :return: True if precheck method is implemented
+            :rtype: bool
+        """
+        return type(self).precheck is not BaseProvider.precheck
+
     def enrol(self, samples, model=None):
         """
             Update the model with a new enrolment sample
@@ -167,7 +227,7 @@ class BaseProvider:
             :type: tesla_ce_provider.result.NotificationTask
         """
         # Add notification to the list of notifications
-        self._notifications.append(notification)
+        self.notifications.append(notification)
 
     def update_delayed_result(self, result):
         """
@@ -176,24 +236,30 @@ class BaseProvider:
             :param result: Result
             :type: tesla_ce_provider.result.DelayedResult
         """
-        self._delayed_results.append(result)
+        self.delayed_results.append(result)
 
     @property
     def notifications(self):
         """
-            Access to the list of notifications
+            Access to the list of notifications of current task invocation
 
             :return: List of notifications
             :rtype: list
         """
-        return self._notifications
+        context = get_context()
+        if context is None:
+            return self._notifications
+        return context.notifications
 
     @property
     def delayed_results(self):
         """
-            Access to the list of delayed_results
+            Access to the list of delayed_results of current task invocation
 
             :return: List of delayed_results
             :rtype: list
         """
-        return self._delayed_results
+        context = get_context()
+        if context is None:
+            return self._delayed_results
+        return context.delayed_results
@@ -0,0 +1,118 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider registry module """
+import gc
+import os
+import resource
+import threading
+import time
+from .base import BaseProvider
+from .. import config
+
+#: Provider instance shared by all the tasks of the process
+_provider = None
+
+#: Memory and time used to create the shared provider
+_footprint = None
+
+_lock = threading.Lock()
+
+
+def _get_rss():
+    """
+        Get the resident memory of current process
+
+        :return: Resident memory in bytes
+        :rtype: int
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # Peak resident memory, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_provider():
+    """
+        Get the provider instance shared by all the tasks of the process. It is created on first access, with the
+        class set in PROVIDER_CLASS, and only once if several threads access it at the same time. Instances created
+        before forking worker processes are inherited by them.
+
+        :return: Provider instance
+        :rtype: BaseProvider
+    """
+    global _provider, _footprint
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                rss = _get_rss()
+                start = time.monotonic()
+                provider = BaseProvider.get_provider()
+                _footprint = {
+                    'class': '{}.{}'.format(type(provider).__module__, type(provider).__qualname__),
+                    'pid': os.getpid(),
+                    'load_time': time.monotonic() - start,
+                    'memory': max(0, _get_rss() - rss),
+                }
+                _provider = provider
+    return _provider
+
+
+def get_provider_footprint():
+    """
+        Get the resources used to create the shared provider. Memory is measured as the growth of the resident
+        memory of the process while the provider was created.
+
+        :return: Provider class (class), process that created it (pid), creation time in seconds (load_time) and
+                 memory in bytes (memory), or None if the provider has not been created
+        :rtype: dict
+    """
+    with _lock:
+        if _footprint is None:
+            return None
+        footprint = dict(_footprint)
+    footprint['rss'] = _get_rss()
+    return footprint
+
+
+def preload_provider():
+    """
+        Prepare the provider in the parent worker process, before the pool processes are forked. Provider resources
+        are loaded with BaseProvider.preload and, unless PROVIDER_PRELOAD_INSTANCE is disabled, the shared provider
+        instance is created. Then the objects of the process are moved to the permanent generation of the garbage
+        collector, so collections in the forked processes do not write to their pages and they stay shared.
+
+        :return: Seconds spent loading the provider
+        :rtype: float
+    """
+    start = time.monotonic()
+    BaseProvider.get_provider_class().preload()
+    if config.get_bool('PROVIDER_PRELOAD_INSTANCE', True):
+        get_provider()
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    return time.monotonic() - start
+
+
+def reset_provider():
+    """
+        Discard the shared provider. Next access will create a new instance.
+    """
+    global _provider, _footprint
+    with _lock:
+        _provider = None
+        _footprint = None
@@ -0,0 +1,255 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider API rate limiting module """
+import functools
+import inspect
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+#: Layout of the bucket state: available tokens and time of the last update
+_STATE = struct.Struct('dd')
+
+
+class TokenBucket:
+    """
+        Token bucket stored in a file, shared by all the processes of the node using the same file. The state is
+        updated with the file locked, so concurrent processes and threads consume tokens in turns. Callers that find
+        the bucket empty wait until a token is available.
+    """
+
+    def __init__(self, path, rate, burst):
+        """
+            Create a token bucket
+
+            :param path: Path to the bucket file. It is created if it does not exist.
+            :type path: str
+            :param rate: Tokens added per second
+            :type rate: float
+            :param burst: Maximum number of tokens in the bucket
+            :type burst: float
+        """
+        self.path = path
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._fd = None
+        self._fd_pid = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.delayed = 0
+        self.wait_time = 0.0
+
+    def _get_fd(self):
+        """
+            Get the descriptor of the bucket file. Locks are shared by descriptors inherited from the parent process,
+            therefore the file is opened again after a fork.
+
+            :return: File descriptor
+            :rtype: int
+        """
+        pid = os.getpid()
+        if self._fd is None or self._fd_pid != pid:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._fd_pid = pid
+        return self._fd
+
+    def _take(self):
+        """
+            Take a token from the bucket if there is one available
+
+            :return: Seconds to wait for next token, or zero if a token was taken
+            :rtype: float
+        """
+        fd = self._get_fd()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            state = os.pread(fd, _STATE.size, 0)
+            if len(state) == _STATE.size:
+                tokens, updated = _STATE.unpack(state)
+                tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            else:
+                tokens = self.burst
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            os.pwrite(fd, _STATE.pack(tokens, now), 0)
+            return wait
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """
+            Take a token from the bucket, waiting until one is available
+        """
+        waited = 0.0
+        with self._lock:
+            wait = self._take()
+            while wait > 0:
+                time.sleep(wait)
+                waited += wait
+                wait = self._take()
+            self.calls += 1
+            if waited > 0:
+                self.delayed += 1
+                self.wait_time += waited
+
+    def stats(self):
+        """
+            Get the counters of the bucket in current process
+            :return: Calls (calls), calls that waited for a token (delayed) and total waiting time in seconds
+                     (wait_time)
+            :rtype: dict
+        """
+        return {
+            'calls': self.calls,
+            'delayed': self.delayed,
+            'wait_time': self.wait_time,
+        }
+
+
+class RateLimiter:
+    """
+        Rate limits for the endpoints of the TeSLA API. The budget of an endpoint, in calls per second, is read from
+        API_RATE_LIMIT_<ENDPOINT>, where endpoint is the name of the client method in upper case (for instance
+        API_RATE_LIMIT_GET_MODEL), or from API_RATE_LIMIT for all other endpoints. Bursts of up to
+        API_RATE_BURST_<ENDPOINT> or API_RATE_BURST calls are allowed, which by default is the budget of one second.
+        Endpoints without budget are not limited.
+    """
+
+    def __init__(self, directory):
+        """
+            Create a rate limiter
+
+            :param directory: Directory for the bucket files shared by the processes of the node
+            :type directory: str
+        """
+        self.directory = directory
+        self._buckets = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_bucket(self, endpoint):
+        """
+            Get the token bucket of an endpoint
+
+            :param endpoint: Endpoint name
+            :type endpoint: str
+            :return: Token bucket, or None if the endpoint is not limited
+            :rtype: TokenBucket
+        """
+        with self._lock:
+            if endpoint not in self._buckets:
+                key = re.sub(r'[^A-Z0-9]', '_', endpoint.upper())
+                rate = config.get_float('API_RATE_LIMIT_{}'.format(key), config.get_float('API_RATE_LIMIT', 0))
+                bucket = None
+                if rate > 0:
+                    burst = config.get_float('API_RATE_BURST_{}'.format(key), config.get_float('API_RATE_BURST', rate))
+                    bucket = TokenBucket(os.path.join(self.directory, '{}.bucket'.format(endpoint)), rate, burst)
+                self._buckets[endpoint] = bucket
+            return self._buckets[endpoint]
+
+    def acquire(self, endpoint):
+        """
+            Wait until a call to an endpoint is allowed
+
+            :param endpoint: Endpoint name
+            :type endpoint: str
+        """
+        bucket = self.get_bucket(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+
+    def stats(self):
+        """
+            Get the counters of the limited endpoints in current process
+            :return: Counters of each endpoint, as provided by TokenBucket.stats
+            :rtype: dict
+        """
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {endpoint: bucket.stats() for endpoint, bucket in buckets.items() if bucket is not None}
+
+
+class RateLimitedProxy:
+    """
+        Proxy to an API client object that waits for the rate limiter before each method call. Nested objects are
+        also proxied, so calls like client.provider.enrolment.get_model are limited with the budget of get_model.
+    """
+
+    def __init__(self, target, limiter, name=None):
+        """
+            Create a proxy
+
+            :param target: Proxied object
+            :param limiter: Rate limiter
+            :type limiter: RateLimiter
+            :param name: Attribute name of the proxied object, used as endpoint name when it is called
+            :type name: str
+        """
+        self._target = target
+        self._limiter = limiter
+        self._name = name
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name.startswith('_') or value is None or isinstance(value, (str, int, float, bool, dict, list, tuple)):
+            return value
+        if inspect.isroutine(value):
+            @functools.wraps(value)
+            def limited(*args, **kwargs):
+                self._limiter.acquire(name)
+                return value(*args, **kwargs)
+            return limited
+        return RateLimitedProxy(value, self._limiter, name)
+
+    def __call__(self, *args, **kwargs):
+        self._limiter.acquire(self._name)
+        return self._target(*args, **kwargs)
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """
+        Get the rate limiter of this node. Bucket files are stored in API_RATE_LIMIT_DIR, which by default is a
+        directory in the system temporary folder.
+
+        :return: Rate limiter, or None if no budget is configured
+        :rtype: RateLimiter
+    """
+    global _limiter
+    if _limiter is None:
+        enabled = any(key.startswith('API_RATE_LIMIT') and key != 'API_RATE_LIMIT_DIR' and value not in ['', '0']
+                      for key, value in os.environ.items())
+        _limiter = False
+        if enabled:
+            _limiter = RateLimiter(os.getenv('API_RATE_LIMIT_DIR', None) or
+                                   os.path.join(tempfile.gettempdir(), 'tesla_ce_provider_rate_limit'))
+    return _limiter or None
@@ -0,0 +1,209 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider shared arrays module """
+import atexit
+import os
+import re
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+class SharedArrayStore:
+    """
+        Named read-only arrays shared by all the processes of the node. Each array is published once, in a file of a
+        directory in memory or on disk, and processes attach to it memory mapped, without copying it. Processes using
+        an array are registered as references, and the file is removed when the last one releases it.
+    """
+
+    def __init__(self, directory):
+        """
+            Create a store
+
+            :param directory: Path to the directory with the arrays. It is created if it does not exist.
+            :type directory: str
+        """
+        self.directory = directory
+        self._arrays = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, name, suffix):
+        """
+            Get the path of a file of an array
+
+            :param name: Array name
+            :type name: str
+            :param suffix: File suffix
+            :type suffix: str
+            :return: File path
+            :rtype: str
+        """
+        if re.match(r'^[A-Za-z0-9_.-]+$', name) is None:
+            raise ValueError('Invalid shared array name {}'.format(name))
+        return os.path.join(self.directory, '{}{}'.format(name, suffix))
+
+    def get(self, name, loader):
+        """
+            Get a shared array, publishing it if no process of the node did it before
+
+            :param name: Array name. It can contain letters, digits, dots, hyphens and underscores.
+            :type name: str
+            :param loader: Function without arguments that returns the array. It is only called by the first process.
+            :type loader: callable
+            :return: Read-only array
+            :rtype: numpy.ndarray
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ModuleNotFoundError('Shared arrays require numpy package.')
+        with self._lock:
+            array = self._arrays.get(name)
+            if array is not None and array[1] == os.getpid():
+                return array[0]
+            path = self._get_path(name, '.npy')
+            with open(self._get_path(name, '.lock'), 'a+') as lock_fh:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh, fcntl.LOCK_EX)
+                if not os.path.exists(path):
+                    value = numpy.ascontiguousarray(loader())
+                    tmp_fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                    try:
+                        with os.fdopen(tmp_fd, 'wb') as tmp_fh:
+                            numpy.save(tmp_fh, value, allow_pickle=False)
+                        os.replace(tmp_path, path)
+                    except BaseException:
+                        os.remove(tmp_path)
+                        raise
+                self._add_reference(name)
+            array = numpy.load(path, mmap_mode='r', allow_pickle=False)
+            self._arrays[name] = (array, os.getpid())
+            return array
+
+    def _add_reference(self, name):
+        """
+            Register current process as a reference to an array. Must be called with the array lock held.
+
+            :param name: Array name
+            :type name: str
+        """
+        references = self._get_path(name, '.refs')
+        os.makedirs(references, exist_ok=True)
+        open(os.path.join(references, str(os.getpid())), 'a').close()
+
+    @staticmethod
+    def _is_alive(pid):
+        """
+            Check if a process is running
+
+            :param pid: Process identifier
+            :type pid: int
+            :return: True if the process exists
+            :rtype: bool
+        """
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def release(self, name):
+        """
+            Release the reference of current process to an array. The array is removed when no running process
+            references it. Arrays obtained before must not be used after releasing them.
+
+            :param name: Array name
+            :type name: str
+        """
+        with self._lock:
+            self._arrays.pop(name, None)
+            with open(self._get_path(name, '.lock'), 'a+') as lock_fh:
+                if fcntl is not None:
+                    fcntl.flock(lock_fh, fcntl.LOCK_EX)
+                references = self._get_path(name, '.refs')
+                try:
+                    pids = os.listdir(references)
+                except FileNotFoundError:
+                    pids = []
+                alive = 0
+                for pid in pids:
+                    if int(pid) == os.getpid() or not self._is_alive(int(pid)):
+                        os.remove(os.path.join(references, pid))
+                    else:
+                        alive += 1
+                if alive == 0:
+                    try:
+                        os.remove(self._get_path(name, '.npy'))
+                    except FileNotFoundError:
+                        pass
+
+    def release_all(self):
+        """
+            Release all the arrays used by current process
+        """
+        with self._lock:
+            names = [name for name, array in self._arrays.items() if array[1] == os.getpid()]
+        for name in names:
+            self.release(name)
+
+    def stats(self):
+        """
+            Get the arrays used by current process
+            :return: Size in bytes of each array
+            :rtype: dict
+        """
+        with self._lock:
+            return {name: array[0].nbytes for name, array in self._arrays.items() if array[1] == os.getpid()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shared_array_store():
+    """
+        Get the shared array store of the node. Arrays are stored in SHARED_ARRAYS_DIR, by default in a directory in
+        /dev/shm if it is available, or in the system temporary folder otherwise.
+
+        :return: Shared array store
+        :rtype: SharedArrayStore
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            directory = os.getenv('SHARED_ARRAYS_DIR', None)
+            if directory is None or directory == '':
+                base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+                directory = os.path.join(base, 'tesla_ce_provider_arrays')
+            _store = SharedArrayStore(directory)
+    return _store
+
+
+def release_shared_arrays():
+    """
+        Release all the shared arrays used by current process
+    """
+    if _store is not None:
+        _store.release_all()
+
+
+atexit.register(release_shared_arrays)
@@ -0,0 +1,59 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage access package """
+from .session import get_session, reset_session, get_timeout, StorageException, StorageUnavailableException, \
+    fetch, fetch_json, fetch_object, fetch_content, fetch_typed, upload
+from .compression import compress, decompress, encode_json, get_model_codec
+from .streaming import StreamedData, decode_stream, fetch_payload, is_streaming_enabled
+from .sidecar import decode_payload, load_sidecar
+from .model_store import ModelStore, get_model_store
+from .conditional import ConditionalCache, get_conditional_cache
+from .prefetch import prefetch, submit
+from .retry import fetch_with_retry, get_retry_stats
+from .hedging import fetch_guarded, get_host_stats
+
+__all__ = [
+    "get_session",
+    "reset_session",
+    "get_timeout",
+    "StorageException",
+    "StorageUnavailableException",
+    "fetch",
+    "fetch_json",
+    "fetch_object",
+    "fetch_content",
+    "fetch_typed",
+    "upload",
+    "compress",
+    "decompress",
+    "encode_json",
+    "get_model_codec",
+    "StreamedData",
+    "decode_stream",
+    "fetch_payload",
+    "is_streaming_enabled",
+    "decode_payload",
+    "load_sidecar",
+    "ModelStore",
+    "get_model_store",
+    "ConditionalCache",
+    "get_conditional_cache",
+    "prefetch",
+    "submit",
+    "fetch_with_retry",
+    "get_retry_stats",
+    "fetch_guarded",
+    "get_host_stats",
+]
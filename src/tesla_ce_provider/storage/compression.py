@@ -0,0 +1,117 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage compression module """
+import gzip
+import os
+import zlib
+import simplejson
+from .. import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#: Magic numbers of compressed contents
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_ZLIB_HEADERS = [b'\x78\x01', b'\x78\x5e', b'\x78\x9c', b'\x78\xda']
+
+
+def get_accept_encoding():
+    """
+        Get the content encodings accepted on storage downloads
+
+        :return: Value for the Accept-Encoding header
+        :rtype: str
+    """
+    encodings = ['gzip', 'deflate']
+    if zstandard is not None:
+        encodings.append('zstd')
+    return ', '.join(encodings)
+
+
+def compress(content, codec):
+    """
+        Compress a content
+
+        :param content: Content to compress
+        :type content: bytes
+        :param codec: Compression codec: gzip, deflate or zstd
+        :type codec: str
+        :return: Compressed content
+        :rtype: bytes
+    """
+    if codec == 'gzip':
+        return gzip.compress(content)
+    if codec == 'deflate':
+        return zlib.compress(content)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ModuleNotFoundError('zstd compression requires zstandard package.')
+        return zstandard.ZstdCompressor().compress(content)
+    raise ValueError('Invalid compression codec {}'.format(codec))
+
+
+def decompress(content):
+    """
+        Decompress a content, detecting the codec from its header. Contents that are not compressed are returned
+        unchanged, so objects stored before compression was enabled can still be read.
+
+        :param content: Content to decompress. Any bytes-like object is accepted, such as a memory map.
+        :type content: bytes
+        :return: Decompressed content
+        :rtype: bytes
+    """
+    if content[:2] == _GZIP_MAGIC:
+        return gzip.decompress(content)
+    if content[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise ModuleNotFoundError('zstd compression requires zstandard package.')
+        return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    if content[:2] in _ZLIB_HEADERS:
+        return zlib.decompress(content)
+    return content
+
+
+def get_model_codec():
+    """
+        Get the codec used to compress learner models
+
+        :return: Codec set in MODEL_COMPRESSION, or None if models are not compressed
+        :rtype: str
+    """
+    codec = os.getenv('MODEL_COMPRESSION', None)
+    if codec is None or codec in ['', 'none']:
+        return None
+    return codec
+
+
+def encode_json(value):
+    """
+        Encode a JSON object, compressing it with the codec set in MODEL_COMPRESSION when its size is at least
+        MODEL_COMPRESSION_THRESHOLD bytes
+
+        :param value: Object to encode
+        :return: Tuple with the encoded object and the codec used, or None if it is not compressed
+        :rtype: tuple
+    """
+    content = simplejson.dumps(value).encode('utf-8')
+    codec = get_model_codec()
+    if codec is None:
+        return content, None
+    if len(content) < config.get_int('MODEL_COMPRESSION_THRESHOLD', 64 * 1024):
+        return content, None
+    return compress(content, codec), codec
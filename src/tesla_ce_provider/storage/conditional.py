@@ -0,0 +1,168 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider conditional requests module """
+import os
+import threading
+import time
+import simplejson
+from .. import config
+from . import files
+
+
+class ConditionalCache:
+    """
+        Local copies of storage objects together with their cache validators (ETag and Last-Modified). Validators
+        are sent on next requests for the same object, and the local copy is used when storage answers that the
+        object has not been modified. Objects are identified by their URL without query string, as signed storage
+        URLs change on every request. The directory is scanned to remove least recently used copies only when the
+        size tracked by the process exceeds the budget, or every EVICT_INTERVAL seconds to account for the copies
+        written by other processes.
+    """
+
+    #: Maximum seconds between scans of the directory
+    EVICT_INTERVAL = 60
+
+    def __init__(self, directory, max_size):
+        """
+            Create a conditional cache
+
+            :param directory: Path to the cache directory. It is created if it does not exist.
+            :type directory: str
+            :param max_size: Maximum total size of the local copies in bytes
+            :type max_size: int
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        # Size of the copies found on last scan, plus the copies written since then by this process
+        self._size = None
+        self._scanned_at = None
+        self._lock = threading.Lock()
+
+    def _get_path(self, url):
+        """
+            Get the path of the local copy of an object
+            :param url: Storage URL
+            :type url: str
+            :return: File path
+            :rtype: str
+        """
+        return os.path.join(self.directory, '{}.object'.format(files.get_hash(url.split('?')[0])))
+
+    def _read(self, url):
+        """
+            Read the local copy of an object. Each file contains a line with the validators followed by the content.
+
+            :param url: Storage URL
+            :type url: str
+            :return: Tuple with validators and content, or None if there is no local copy
+            :rtype: tuple
+        """
+        try:
+            with open(self._get_path(url), 'rb') as object_fh:
+                validators = simplejson.loads(object_fh.readline())
+                content = object_fh.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        return validators, content
+
+    def get_headers(self, url):
+        """
+            Get the conditional headers for a request
+
+            :param url: Storage URL
+            :type url: str
+            :return: Request headers
+            :rtype: dict
+        """
+        path = self._get_path(url)
+        try:
+            with open(path, 'rb') as object_fh:
+                validators = simplejson.loads(object_fh.readline())
+        except (FileNotFoundError, ValueError):
+            return {}
+        headers = {}
+        if validators.get('etag') is not None:
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified') is not None:
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def get_object(self, url):
+        """
+            Get the local copy of an object not modified in storage, together with its content type
+
+            :param url: Storage URL
+            :type url: str
+            :return: Tuple with the object content and its content type, or None if the local copy is not available
+                     anymore
+            :rtype: tuple
+        """
+        local = self._read(url)
+        if local is None:
+            return None
+        # Modification time is used to track the last access
+        files.touch(self._get_path(url))
+        return local[1], local[0].get('content_type')
+
+    def put(self, url, headers, content):
+        """
+            Store the local copy of an object, if storage provided validators for it
+
+            :param url: Storage URL
+            :type url: str
+            :param headers: Response headers
+            :type headers: dict
+            :param content: Object content
+            :type content: bytes
+        """
+        validators = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': headers.get('Content-Type'),
+        }
+        if validators['etag'] is None and validators['last_modified'] is None:
+            return
+        if len(content) > self.max_size:
+            return
+        data = simplejson.dumps(validators).encode('utf-8') + b'\n' + content
+        files.write_atomic(self._get_path(url), data)
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            if self._size is None or self._size > self.max_size or \
+                    time.monotonic() - self._scanned_at > self.EVICT_INTERVAL:
+                self._size = files.evict(self.directory, self.max_size, '.object')
+                self._scanned_at = time.monotonic()
+
+
+#: Conditional cache of current process
+_cache = None
+
+
+def get_conditional_cache():
+    """
+        Get the conditional cache configured for this node
+
+        :return: Conditional cache, or None if STORAGE_CACHE_DIR is not set
+        :rtype: ConditionalCache
+    """
+    global _cache
+    directory = os.getenv('STORAGE_CACHE_DIR', None)
+    if directory is None or directory == '':
+        return None
+    if _cache is None or _cache.directory != directory:
+        _cache = ConditionalCache(directory, config.get_int('STORAGE_CACHE_SIZE_MB', 1024) * 1024 * 1024)
+    return _cache
@@ -0,0 +1,119 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider local storage files module """
+import hashlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+def get_hash(value):
+    """
+        Get a hash of a value that can be used as file name
+        :param value: Value to hash
+        :type value: str
+        :return: Hexadecimal hash
+        :rtype: str
+    """
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()
+
+
+def write_atomic(path, content):
+    """
+        Write a file using a temporary file that is moved to its final path, so other processes never read partial
+        contents
+
+        :param path: File path
+        :type path: str
+        :param content: File content
+        :type content: bytes
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file_fh:
+            file_fh.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove(path):
+    """
+        Remove a file, ignoring files already removed by other processes
+        :param path: File path
+        :type path: str
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict(directory, max_size, suffix):
+    """
+        Remove least recently modified files until the total size of a directory is within a budget. Processes
+        sharing the directory are serialized using a lock file.
+
+        :param directory: Directory path
+        :type directory: str
+        :param max_size: Maximum total size of the files in bytes
+        :type max_size: int
+        :param suffix: Only files with this suffix are considered
+        :type suffix: str
+        :return: Total size of the files after the eviction, in bytes
+        :rtype: int
+    """
+    lock_fh = open(os.path.join(directory, '.lock'), 'w')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+        files = []
+        total_size = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(suffix):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total_size <= max_size:
+                break
+            remove(path)
+            total_size -= size
+    finally:
+        lock_fh.close()
+    return total_size
+
+
+def touch(path):
+    """
+        Update the modification time of a file, which is used to track the last access
+        :param path: File path
+        :type path: str
+    """
+    try:
+        os.utime(path, None)
+    except FileNotFoundError:
+        pass
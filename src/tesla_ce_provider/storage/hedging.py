@@ -0,0 +1,309 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage hedging and circuit breaker module """
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+import requests
+from .. import config
+from .session import StorageException, StorageUnavailableException
+
+#: Number of latencies kept for each host
+LATENCY_SAMPLES = 256
+
+
+class HostState:
+    """
+        Health of a storage host: latencies of recent requests and a circuit breaker. After STORAGE_BREAKER_FAILURES
+        consecutive failures, the circuit is opened and requests are refused during STORAGE_BREAKER_RESET seconds.
+        Then a single trial request is allowed, which closes the circuit if it succeeds.
+    """
+
+    def __init__(self, host):
+        """
+            Create the state of a host
+
+            :param host: Storage host
+            :type host: str
+        """
+        self.host = host
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.rejected = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def before_request(self, url):
+        """
+            Check if a request can be sent to the host
+
+            :param url: Storage URL
+            :type url: str
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self._trial and time.monotonic() - self._opened_at >= config.get_float('STORAGE_BREAKER_RESET',
+                                                                                          30):
+                self._trial = True
+                return
+            self.rejected += 1
+        raise StorageUnavailableException(url, self.host)
+
+    def on_success(self, latency=None):
+        """
+            Register a request answered by the host
+
+            :param latency: Time to answer in seconds
+            :type latency: float
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def on_failure(self):
+        """
+            Register a request the host failed to answer
+        """
+        threshold = config.get_int('STORAGE_BREAKER_FAILURES', 5)
+        with self._lock:
+            self._failures += 1
+            if self._trial or (threshold > 0 and self._failures >= threshold):
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def on_hedge(self, won=False):
+        """
+            Register a hedged request
+
+            :param won: Whether the hedged request answered before the original one
+            :type won: bool
+        """
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedged += 1
+
+    def get_latency(self, percentile):
+        """
+            Get a percentile of the recent latencies
+
+            :param percentile: Percentile, from 0 to 100
+            :type percentile: float
+            :return: Latency in seconds, or None if there are not enough samples
+            :rtype: float
+        """
+        with self._lock:
+            if len(self._latencies) < config.get_int('STORAGE_HEDGE_MIN_SAMPLES', 20):
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    def stats(self):
+        """
+            Get the counters of the host
+            :return: Host counters
+            :rtype: dict
+        """
+        with self._lock:
+            return {
+                'open': self._opened_at is not None,
+                'failures': self._failures,
+                'rejected': self.rejected,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+            }
+
+
+#: States of the storage hosts used by current process
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+#: Executor for hedged requests of current process
+_executor = None
+_executor_pid = None
+
+
+def get_host_state(url):
+    """
+        Get the state of the storage host of an URL
+
+        :param url: Storage URL
+        :type url: str
+        :return: Host state
+        :rtype: HostState
+    """
+    host = urlsplit(url).netloc
+    with _hosts_lock:
+        state = _hosts.get(host)
+        if state is None:
+            state = HostState(host)
+            _hosts[host] = state
+    return state
+
+
+def _get_executor():
+    """
+        Get the executor used for hedged requests in current process. It is separated from the background executor,
+        as hedged requests are sent from background downloads.
+
+        :return: Hedging executor
+        :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _hosts_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=config.get_int('STORAGE_HEDGE_WORKERS', 8),
+                                               thread_name_prefix='tesla_ce_hedging')
+                _executor_pid = pid
+    return _executor
+
+
+def _after_fork_in_child():
+    """
+        Drop the executor and the host states inherited from parent process
+    """
+    global _executor, _executor_pid, _hosts_lock
+    _executor = None
+    _executor_pid = None
+    _hosts_lock = threading.Lock()
+    _hosts.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _is_failure(exc):
+    """
+        Check if an error shows that the storage host is failing
+
+        :param exc: Error raised by a storage request
+        :type exc: Exception
+        :return: True for connection errors, timeouts and server errors
+        :rtype: bool
+    """
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return isinstance(exc, StorageException) and exc.status_code is not None and exc.status_code >= 500
+
+
+def _timed(fetch, url):
+    """
+        Run a storage request measuring its duration
+
+        :param fetch: Storage function
+        :type fetch: callable
+        :param url: Storage URL
+        :type url: str
+        :return: Tuple with the value returned by the storage function and the duration in seconds
+        :rtype: tuple
+    """
+    start = time.monotonic()
+    value = fetch(url)
+    return value, time.monotonic() - start
+
+
+def fetch_guarded(fetch, url):
+    """
+        Run a storage request through the circuit breaker of its host. Requests to failing hosts are refused with
+        StorageUnavailableException. When STORAGE_HEDGING is enabled, a second request is sent if the first one
+        takes longer than the STORAGE_HEDGE_PERCENTILE percentile of the recent latencies of the host, and the first
+        answer is used.
+
+        :param fetch: Storage function used to download the object
+        :type fetch: callable
+        :param url: Storage URL
+        :type url: str
+        :return: Value returned by the storage function
+    """
+    state = get_host_state(url)
+    state.before_request(url)
+    delay = None
+    if config.get_bool('STORAGE_HEDGING', False):
+        delay = state.get_latency(config.get_float('STORAGE_HEDGE_PERCENTILE', 95))
+    try:
+        if delay is None:
+            value, latency = _timed(fetch, url)
+        else:
+            value, latency = _fetch_hedged(state, fetch, url, delay)
+    except Exception as exc:
+        if _is_failure(exc):
+            state.on_failure()
+        else:
+            state.on_success()
+        raise
+    state.on_success(latency)
+    return value
+
+
+def _fetch_hedged(state, fetch, url, delay):
+    """
+        Send a storage request, and a second one if the first does not answer before a delay
+
+        :param state: Host state
+        :type state: HostState
+        :param fetch: Storage function
+        :type fetch: callable
+        :param url: Storage URL
+        :type url: str
+        :param delay: Seconds to wait before sending the second request
+        :type delay: float
+        :return: Tuple with the first value returned and its request duration
+        :rtype: tuple
+    """
+    executor = _get_executor()
+    primary = executor.submit(_timed, fetch, url)
+    done, pending = wait([primary], timeout=delay)
+    if len(done) > 0:
+        return primary.result()
+
+    state.on_hedge()
+    hedge = executor.submit(_timed, fetch, url)
+    pending = {primary, hedge}
+    error = None
+    while len(pending) > 0:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    state.on_hedge(won=True)
+                # The other request cannot be interrupted, and its result is discarded
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def get_host_stats():
+    """
+        Get the counters of the storage hosts used by current process
+        :return: Counters of each host, as provided by HostState.stats
+        :rtype: dict
+    """
+    with _hosts_lock:
+        states = list(_hosts.values())
+    return {state.host: state.stats() for state in states}
@@ -0,0 +1,130 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider node-level model store module """
+import glob
+import mmap
+import os
+import simplejson
+from .. import config
+from . import files
+from .compression import decompress
+
+
+class ModelStore:
+    """
+        Local directory with the content of learner models, shared by all the processes of a node. Each model
+        version is stored in its own file, which is read through a memory map, and least recently used files are
+        removed when the total size of the store exceeds its budget.
+    """
+
+    def __init__(self, directory, max_size):
+        """
+            Create a model store
+
+            :param directory: Path to the store directory. It is created if it does not exist.
+            :type directory: str
+            :param max_size: Maximum total size of the stored models in bytes
+            :type max_size: int
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, url, version):
+        """
+            Get the path of the file for a model version
+            :param url: Model storage URL, without query string
+            :type url: str
+            :param version: Model version
+            :type version: str
+            :return: File path
+            :rtype: str
+        """
+        return os.path.join(self.directory, '{}.{}.json'.format(files.get_hash(url), files.get_hash(version)))
+
+    def get(self, url, version):
+        """
+            Read a model from the store
+
+            :param url: Model storage URL, without query string
+            :type url: str
+            :param version: Model version
+            :type version: str
+            :return: Tuple with the decoded model and its uncompressed size in bytes, or None if the model is not in
+                     the store
+            :rtype: tuple
+        """
+        path = self._get_path(url, version)
+        try:
+            with open(path, 'rb') as model_fh:
+                if os.fstat(model_fh.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(model_fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # Content is decompressed or decoded straight from the mapping, without reading it to memory
+                    content = decompress(mapped)
+                    size = len(content)
+                    model = simplejson.loads(str(content, 'utf-8'))
+        except (FileNotFoundError, ValueError):
+            return None
+        # Modification time is used to track the last access
+        files.touch(path)
+        return model, size
+
+    def put(self, url, version, content):
+        """
+            Add a model to the store, replacing other versions of the same model
+
+            :param url: Model storage URL, without query string
+            :type url: str
+            :param version: Model version
+            :type version: str
+            :param content: Encoded model
+            :type content: bytes
+        """
+        if len(content) > self.max_size:
+            return
+        path = self._get_path(url, version)
+        # Write to a temporary file and move it, so other processes never read partial models
+        files.write_atomic(path, content)
+        for old_path in glob.glob(os.path.join(self.directory, '{}.*.json'.format(files.get_hash(url)))):
+            if old_path != path:
+                files.remove(old_path)
+        self.evict()
+
+    def evict(self):
+        """
+            Remove least recently used models until the total size of the store is within the budget
+        """
+        files.evict(self.directory, self.max_size, '.json')
+
+
+#: Model store of current process
+_store = None
+
+
+def get_model_store():
+    """
+        Get the model store configured for this node
+
+        :return: Model store, or None if MODEL_STORE_DIR is not set
+        :rtype: ModelStore
+    """
+    global _store
+    directory = os.getenv('MODEL_STORE_DIR', None)
+    if directory is None or directory == '':
+        return None
+    if _store is None or _store.directory != directory:
+        _store = ModelStore(directory, config.get_int('MODEL_STORE_SIZE_MB', 1024) * 1024 * 1024)
+    return _store
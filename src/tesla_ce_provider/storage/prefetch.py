@@ -0,0 +1,113 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage prefetch module """
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .. import config
+
+#: Shared executor for background downloads of current process
+_executor = None
+
+#: Process that created the shared executor
+_executor_pid = None
+
+#: Lock protecting executor creation
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+        Get the executor used for background downloads in current process. A new one is created the first time it
+        is accessed after a fork, as threads are not inherited by child processes.
+
+        :return: Background executor
+        :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=config.get_int('STORAGE_BACKGROUND_WORKERS', 4),
+                                               thread_name_prefix='tesla_ce_background')
+                _executor_pid = pid
+    return _executor
+
+
+def _after_fork_in_child():
+    """
+        Drop the executor inherited from parent process
+    """
+    global _executor, _executor_pid, _executor_lock
+    _executor = None
+    _executor_pid = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def submit(load, *args, **kwargs):
+    """
+        Run a loading function on background
+
+        :param load: Function to run
+        :type load: callable
+        :return: Future for the loaded value
+        :rtype: concurrent.futures.Future
+    """
+    return get_executor().submit(load, *args, **kwargs)
+
+
+def prefetch(items, load, window=8, workers=4):
+    """
+        Apply a loading function to a sequence of items using a pool of threads. Results are yielded in the same
+        order of the items, and at most window items are loaded ahead of the one being consumed. Exceptions raised
+        by the loading function are raised on the consumer thread when the failing item is reached.
+
+        :param items: Items to load
+        :type items: iterable
+        :param load: Function that receives an item and returns the loaded value
+        :type load: callable
+        :param window: Maximum number of items loaded or being loaded ahead of the consumer
+        :type window: int
+        :param workers: Number of concurrent loading threads
+        :type workers: int
+        :return: Generator of loaded values
+    """
+    window = max(1, window)
+    workers = max(1, min(workers, window))
+    items = iter(items)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tesla_ce_prefetch')
+    try:
+        for item in items:
+            pending.append(executor.submit(load, item))
+            if len(pending) >= window:
+                break
+        while len(pending) > 0:
+            future = pending.popleft()
+            for item in items:
+                pending.append(executor.submit(load, item))
+                break
+            yield future.result()
+    finally:
+        # Consumer stopped before the end or a loading failed. Discard the queued work.
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,110 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage retry module """
+import random
+import threading
+import time
+import requests
+from .. import config
+from .session import StorageException
+from .hedging import fetch_guarded
+
+#: Status codes retried by default, as they are usually transient
+DEFAULT_RETRY_STATUS = [408, 429, 500, 502, 503, 504]
+
+_lock = threading.Lock()
+_counters = {
+    'attempts': 0,
+    'retries': 0,
+    'recovered': 0,
+    'exhausted': 0,
+}
+
+
+def _count(name):
+    """
+        Increase a retry counter
+
+        :param name: Counter name
+        :type name: str
+    """
+    with _lock:
+        _counters[name] += 1
+
+
+def get_backoff(attempt):
+    """
+        Get the delay before an inline retry, using exponential backoff with full jitter. The base delay is
+        STORAGE_RETRY_BACKOFF seconds and the maximum delay STORAGE_RETRY_BACKOFF_MAX seconds.
+
+        :param attempt: Number of the retry, starting at zero
+        :type attempt: int
+        :return: Delay in seconds
+        :rtype: float
+    """
+    delay = min(config.get_float('STORAGE_RETRY_BACKOFF_MAX', 2.0),
+                config.get_float('STORAGE_RETRY_BACKOFF', 0.1) * (2 ** attempt))
+    return random.uniform(0, delay)
+
+
+def fetch_with_retry(fetch, url):
+    """
+        Download an object from storage, retrying in process on transient errors. Storage errors with a status code
+        in STORAGE_RETRY_STATUS and connection errors are retried up to STORAGE_RETRY_ATTEMPTS times. Other errors,
+        and the last error when retries are exhausted, are raised as StorageException, so the task can be
+        rescheduled. Requests are sent through the circuit breaker of the storage host (see fetch_guarded).
+
+        :param fetch: Storage function used to download the object
+        :type fetch: callable
+        :param url: Storage URL
+        :type url: str
+        :return: Value returned by the storage function
+    """
+    attempts = max(0, config.get_int('STORAGE_RETRY_ATTEMPTS', 3))
+    retry_status = config.get_int_list('STORAGE_RETRY_STATUS', DEFAULT_RETRY_STATUS)
+    attempt = 0
+    while True:
+        _count('attempts')
+        try:
+            value = fetch_guarded(fetch, url)
+        except StorageException as exc:
+            if exc.status_code not in retry_status:
+                raise
+            error = exc
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error = StorageException(url)
+            error.__cause__ = exc
+        else:
+            if attempt > 0:
+                _count('recovered')
+            return value
+        if attempt >= attempts:
+            if attempts > 0:
+                _count('exhausted')
+            raise error
+        time.sleep(get_backoff(attempt))
+        attempt += 1
+        _count('retries')
+
+
+def get_retry_stats():
+    """
+        Get inline retry counters of this process
+        :return: Download attempts (attempts), inline retries (retries), downloads that succeeded after retrying
+                 (recovered), and downloads that failed after all the inline retries (exhausted)
+        :rtype: dict
+    """
+    with _lock:
+        return dict(_counters)
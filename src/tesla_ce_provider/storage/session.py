@@ -0,0 +1,265 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider storage session module """
+import io
+import os
+import socket
+import threading
+import requests
+import simplejson
+from requests.adapters import HTTPAdapter
+from .. import config
+from .conditional import get_conditional_cache
+from .compression import decompress, get_accept_encoding
+
+#: Shared session for current process
+_session = None
+
+#: Process that created the shared session
+_session_pid = None
+
+#: Lock protecting session creation
+_session_lock = threading.Lock()
+
+
+class StorageException(Exception):
+    """ Exception raised when a storage object cannot be downloaded """
+
+    def __init__(self, url, status_code=None):
+        """
+            Create a storage exception
+
+            :param url: Storage URL
+            :type url: str
+            :param status_code: HTTP status code returned by storage, if any
+            :type status_code: int
+        """
+        super().__init__('Cannot download storage object [status={}]'.format(status_code))
+        self.url = url
+        self.status_code = status_code
+
+
+class StorageUnavailableException(StorageException):
+    """ Exception raised when storage requests are not sent because the storage host is failing """
+
+    def __init__(self, url, host):
+        """
+            Create a storage unavailable exception
+
+            :param url: Storage URL
+            :type url: str
+            :param host: Storage host
+            :type host: str
+        """
+        super().__init__(url)
+        self.args = ('Storage host {} is not available'.format(host), )
+        self.host = host
+
+
+def get_timeout():
+    """
+        Get the timeout used for storage requests
+
+        :return: Tuple with connection and read timeouts in seconds
+        :rtype: tuple
+    """
+    return config.get_float('STORAGE_CONNECT_TIMEOUT', 5.0), config.get_float('STORAGE_READ_TIMEOUT', 60.0)
+
+
+def _keep_alive_enabled():
+    """
+        Check if connections to storage must be kept open between requests
+
+        :return: True if keep-alive is enabled
+        :rtype: bool
+    """
+    return config.get_bool('STORAGE_KEEP_ALIVE', True)
+
+
+class _StorageAdapter(HTTPAdapter):
+    """ HTTP adapter enabling TCP keep-alive probes on pooled connections """
+
+    def init_poolmanager(self, *args, **kwargs):
+        if _keep_alive_enabled():
+            kwargs['socket_options'] = [
+                (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _create_session():
+    """
+        Create a new pooled session for storage requests
+
+        :return: New session
+        :rtype: requests.Session
+    """
+    pool_size = config.get_int('STORAGE_POOL_SIZE', 10)
+    adapter = _StorageAdapter(pool_connections=config.get_int('STORAGE_POOL_CONNECTIONS', 4),
+                              pool_maxsize=pool_size,
+                              max_retries=0)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if os.getenv('SSL_VERIFY', True) in ['False', 'false', 0, False, '0']:
+        session.verify = False
+    if not _keep_alive_enabled():
+        session.headers['Connection'] = 'close'
+    session.headers['Accept-Encoding'] = get_accept_encoding()
+    return session
+
+
+def get_session():
+    """
+        Get the storage session for current process. Sessions are never shared between processes, a new one is
+        created the first time it is accessed after a fork.
+
+        :return: Storage session
+        :rtype: requests.Session
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def reset_session():
+    """
+        Discard the storage session of current process. When called on a forked child, the sockets inherited from
+        the parent are dropped without being closed, as they are still in use by the parent process.
+    """
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        _session.close()
+    _session = None
+    _session_pid = None
+
+
+def _after_fork_in_child():
+    """
+        Drop the session inherited from parent process
+    """
+    global _session, _session_pid, _session_lock
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def fetch(url, **kwargs):
+    """
+        Perform a GET request to storage using the shared session
+
+        :param url: Storage URL
+        :type url: str
+        :return: Storage response
+        :rtype: requests.Response
+    """
+    kwargs.setdefault('timeout', get_timeout())
+    return get_session().get(url, **kwargs)
+
+
+def fetch_content(url):
+    """
+        Download the content of an object read more than once, as models and validation information. If
+        STORAGE_CACHE_DIR is set, a conditional request is sent for objects with a local copy, which is used when
+        storage answers that the object has not been modified.
+
+        :param url: Storage URL
+        :type url: str
+        :return: Object content
+        :rtype: bytes
+    """
+    return fetch_typed(url, conditional=True)[0]
+
+
+def fetch_typed(url, conditional=False):
+    """
+        Download the content of a storage object together with its content type
+
+        :param url: Storage URL
+        :type url: str
+        :param conditional: Whether to keep a local copy of the object and revalidate it, as fetch_content does.
+                            Objects downloaded only once, as sample and request payloads, are not kept.
+        :type conditional: bool
+        :return: Tuple with the object content and its content type, which is None if storage does not provide it
+        :rtype: tuple
+    """
+    cache = None
+    if conditional:
+        cache = get_conditional_cache()
+    if cache is None:
+        data_resp = fetch(url)
+    else:
+        data_resp = fetch(url, headers=cache.get_headers(url))
+        if data_resp.status_code == 304:
+            local = cache.get_object(url)
+            if local is not None:
+                return local
+            # Local copy was removed after sending the request
+            data_resp = fetch(url)
+    if data_resp.status_code != 200:
+        raise StorageException(url, data_resp.status_code)
+    if cache is not None:
+        cache.put(url, data_resp.headers, data_resp.content)
+    return data_resp.content, data_resp.headers.get('Content-Type')
+
+
+def fetch_object(url):
+    """
+        Download a JSON object from storage
+
+        :param url: Storage URL
+        :type url: str
+        :return: Tuple with the decoded object and the size in bytes of the uncompressed content
+        :rtype: tuple
+    """
+    content = decompress(fetch_content(url))
+    return simplejson.loads(content), len(content)
+
+
+def fetch_json(url):
+    """
+        Download a JSON object from storage
+
+        :param url: Storage URL
+        :type url: str
+        :return: Decoded object
+        :rtype: dict
+    """
+    return fetch_object(url)[0]
+
+
+def upload(upload_url, content):
+    """
+        Upload an object to storage using a signed POST
+
+        :param upload_url: Signed upload information, with the url and the form fields
+        :type upload_url: dict
+        :param content: Object content
+        :type content: bytes
+        :return: Storage response
+        :rtype: requests.Response
+    """
+    return get_session().post(upload_url['url'], data=upload_url['fields'], files={'file': io.BytesIO(content)},
+                              timeout=get_timeout())
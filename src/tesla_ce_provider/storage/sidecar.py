@@ -0,0 +1,247 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider binary payload transport module """
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import simplejson
+from .compression import decompress
+from .session import fetch_typed
+
+#: Envelope field with the location of the object containing the binary data, absolute or relative to the envelope URL
+SIDECAR_FIELD = 'data_object'
+
+#: Content types that can contain a JSON payload. Storage uses generic types for objects uploaded without one.
+_JSON_TYPES = ['application/json', 'text/json', 'text/plain', 'application/octet-stream', 'binary/octet-stream']
+
+
+def _get_media_type(content_type):
+    """
+        Get the media type of a Content-Type header, without parameters
+
+        :param content_type: Content-Type header value
+        :type content_type: str
+        :return: Lower case media type, or None if it is not available
+        :rtype: str
+    """
+    if content_type is None:
+        return None
+    return content_type.split(';')[0].strip().lower() or None
+
+
+def is_json_type(content_type):
+    """
+        Check if a content can be a JSON payload, given its content type
+
+        :param content_type: Content-Type header value
+        :type content_type: str
+        :return: True if the content can be a JSON payload
+        :rtype: bool
+    """
+    media_type = _get_media_type(content_type)
+    return media_type is None or media_type in _JSON_TYPES
+
+
+def _get_boundary(content_type):
+    """
+        Get the boundary of a multipart content
+
+        :param content_type: Content-Type header value
+        :type content_type: str
+        :return: Boundary, or None if it is not available
+        :rtype: bytes
+    """
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary' and len(value) > 0:
+            return value.strip('"').encode('utf-8')
+    return None
+
+
+def split_multipart(content, boundary):
+    """
+        Split a multipart body in its parts
+
+        :param content: Multipart body
+        :type content: bytes
+        :param boundary: Boundary between parts
+        :type boundary: bytes
+        :return: List of tuples with the headers of each part, with lower case names, and its body
+        :rtype: list
+    """
+    delimiter = b'--' + boundary
+    parts = []
+    position = content.find(delimiter)
+    while position >= 0:
+        start = position + len(delimiter)
+        if content[start:start + 2] == b'--':
+            # Close delimiter
+            break
+        end = content.find(b'\r\n' + delimiter, start)
+        if end < 0:
+            break
+        part = content[start:end]
+        header_end = part.find(b'\r\n\r\n')
+        headers = {}
+        if header_end < 0:
+            body = part[2:]
+        else:
+            for line in part[:header_end].decode('utf-8', errors='replace').split('\r\n'):
+                name, _, value = line.partition(':')
+                if len(value) > 0:
+                    headers[name.strip().lower()] = value.strip()
+            body = part[header_end + 4:]
+        parts.append((headers, body))
+        position = end + 2
+    return parts
+
+
+def _set_mimetype(payload, content_type):
+    """
+        Set the mime type of the binary data in the payload metadata, if the envelope does not provide one
+
+        :param payload: Payload
+        :type payload: dict
+        :param content_type: Content type of the binary data
+        :type content_type: str
+    """
+    media_type = _get_media_type(content_type)
+    if media_type is None or media_type in _JSON_TYPES:
+        return
+    if payload.get('metadata') is None:
+        payload['metadata'] = {}
+    payload['metadata'].setdefault('mimetype', media_type)
+
+
+def _decode_multipart(content, boundary):
+    """
+        Decode a multipart payload, with a JSON envelope part and a binary data part. The data part is the one named
+        data, or the first part that is not JSON.
+
+        :param content: Multipart body
+        :type content: bytes
+        :param boundary: Boundary between parts
+        :type boundary: bytes
+        :return: Decoded payload
+        :rtype: dict
+    """
+    payload = None
+    data_part = None
+    for headers, body in split_multipart(content, boundary):
+        disposition = headers.get('content-disposition', '')
+        is_data = 'name="data"' in disposition or 'name=data' in disposition
+        if not is_data and payload is None and _get_media_type(headers.get('content-type')) in [
+                None, 'application/json', 'text/json']:
+            payload = simplejson.loads(body)
+        elif data_part is None:
+            data_part = (headers, body)
+    if payload is None:
+        payload = {}
+    if data_part is not None:
+        payload['data'] = data_part[1]
+        _set_mimetype(payload, data_part[0].get('content-type'))
+    return payload
+
+
+def _decompress_envelope(content):
+    """
+        Decompress a content that can be a compressed envelope. Binary data starting with the header of a
+        compression codec is returned unchanged when it cannot be decompressed.
+
+        :param content: Payload content
+        :type content: bytes
+        :return: Decompressed content
+        :rtype: bytes
+    """
+    try:
+        return decompress(content)
+    except Exception:
+        # Codecs raise their own error types for invalid content
+        return content
+
+
+def decode_payload(content, content_type=None):
+    """
+        Decode a sample or request payload in any of the supported formats:
+            - JSON object with the data encoded in a data URL
+            - JSON envelope referencing a separate object with the binary data (see load_sidecar)
+            - Multipart body with a JSON envelope part and a binary data part
+            - Raw binary object
+        Binary data is provided as bytes in the data field of the payload.
+
+        :param content: Payload content
+        :type content: bytes
+        :param content_type: Content-Type provided by storage
+        :type content_type: str
+        :return: Decoded payload
+        :rtype: dict
+    """
+    media_type = _get_media_type(content_type)
+    if media_type is not None and media_type.startswith('multipart/'):
+        boundary = _get_boundary(content_type)
+        if boundary is not None:
+            return _decode_multipart(content, boundary)
+    if is_json_type(content_type):
+        envelope = _decompress_envelope(content)
+        head = envelope[:256].lstrip()
+        if head.startswith(b'{'):
+            return simplejson.loads(envelope)
+        if head.startswith(b'--'):
+            # Multipart body stored without its content type. Boundary is on the first line.
+            boundary = head[2:].split(b'\r\n', 1)[0].strip()
+            if len(boundary) > 0:
+                return _decode_multipart(envelope, boundary)
+    # Binary data is provided as stored, even if it is compressed
+    payload = {'data': content}
+    _set_mimetype(payload, content_type)
+    return payload
+
+
+def _get_sidecar_url(url, location):
+    """
+        Get the URL of the data object of an envelope
+
+        :param url: Envelope storage URL
+        :type url: str
+        :param location: Location of the data object, as provided in the envelope
+        :type location: str
+        :return: Data object URL
+        :rtype: str
+    """
+    target = urlsplit(urljoin(url, location))
+    if urlsplit(location).netloc != '' or target.query != '':
+        return target.geturl()
+    return urlunsplit(target._replace(query=urlsplit(url).query))
+
+
+def load_sidecar(url, payload):
+    """
+        Download the binary data of a payload stored in a separate object. Envelopes with binary data provide the
+        location of the data object in the SIDECAR_FIELD field. Absolute URLs are used unchanged, so storages
+        signing each object must provide the signed URL of the data object. Relative locations are resolved
+        against the envelope URL, keeping its query string, which contains the signature of storages signing
+        a whole path.
+
+        :param url: Envelope storage URL
+        :type url: str
+        :param payload: Decoded envelope
+        :type payload: dict
+        :return: Payload with the binary data
+        :rtype: dict
+    """
+    if not isinstance(payload, dict) or payload.get(SIDECAR_FIELD) is None:
+        return payload
+    content, content_type = fetch_typed(_get_sidecar_url(url, payload.pop(SIDECAR_FIELD)))
+    payload['data'] = content
+    _set_mimetype(payload, content_type)
+    return payload
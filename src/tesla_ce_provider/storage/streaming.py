@@ -0,0 +1,245 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider streaming decode module """
+import io
+import re
+import simplejson
+from .. import config
+from ..streamed import StreamedData, get_spool_file
+from .session import fetch, fetch_typed, StorageException
+from .sidecar import decode_payload, is_json_type, load_sidecar
+
+#: Size of the chunks read from the socket
+CHUNK_SIZE = 256 * 1024
+
+
+class FieldExtractor:
+    """
+        Incremental JSON scanner that separates the value of a top-level string field from the rest of an object.
+        The field value is written to a buffer as it arrives, and the rest of the object, which is small, is kept
+        to be decoded at the end with the field replaced by null.
+    """
+    _STRING_END = re.compile(rb'["\\]')
+    _STRUCTURE = re.compile(rb'["{}\[\]:,]')
+
+    def __init__(self, field, buffer=None):
+        """
+            Create an extractor
+
+            :param field: Name of the top-level field to extract
+            :type field: str
+            :param buffer: Buffer for the field value. By default an in-memory buffer is used.
+            :type buffer: file
+        """
+        self._field = field.encode('utf-8')
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._capture = False
+        self._key = None
+        self._last_string = None
+        self._target_next = False
+        self._escaped = False
+        self._buffer = buffer if buffer is not None else io.BytesIO()
+        self.skeleton = bytearray()
+        self.found = False
+
+    def _write(self, content):
+        """
+            Write string content to the field buffer or to the object skeleton
+            :param content: String content
+            :type content: bytes
+        """
+        if self._capture:
+            self._buffer.write(content)
+        else:
+            self.skeleton += content
+            if self._key is not None:
+                self._key += content
+
+    def feed(self, chunk):
+        """
+            Process a chunk of the JSON document
+
+            :param chunk: Chunk of the document
+            :type chunk: bytes
+        """
+        pos = 0
+        size = len(chunk)
+        while pos < size:
+            if self._in_string:
+                if self._escape:
+                    # Escaped character split between chunks
+                    self._write(chunk[pos:pos + 1])
+                    pos += 1
+                    self._escape = False
+                    continue
+                match = self._STRING_END.search(chunk, pos)
+                if match is None:
+                    self._write(chunk[pos:])
+                    break
+                end = match.start()
+                if chunk[end] == 0x5c:
+                    self._write(chunk[pos:end + 1])
+                    self._escaped = self._escaped or self._capture
+                    self._escape = True
+                    pos = end + 1
+                    continue
+                self._write(chunk[pos:end])
+                pos = end + 1
+                self._end_string()
+            else:
+                match = self._STRUCTURE.search(chunk, pos)
+                if match is None:
+                    self.skeleton += chunk[pos:]
+                    break
+                self.skeleton += chunk[pos:match.start()]
+                token = chunk[match.start()]
+                pos = match.end()
+                if token == 0x22:
+                    self._in_string = True
+                    if self._target_next and self._depth == 1 and not self.found:
+                        self._capture = True
+                        self.skeleton += b'null'
+                    else:
+                        self.skeleton += b'"'
+                        if self._depth == 1:
+                            self._key = bytearray()
+                elif token in (0x7b, 0x5b):
+                    self._depth += 1
+                    self._target_next = False
+                    self.skeleton.append(token)
+                elif token in (0x7d, 0x5d):
+                    self._depth -= 1
+                    self.skeleton.append(token)
+                elif token == 0x3a:
+                    self._target_next = self._depth == 1 and self._last_string == self._field
+                    self.skeleton.append(token)
+                else:
+                    self._target_next = False
+                    self._last_string = None
+                    self.skeleton.append(token)
+
+    def _end_string(self):
+        """
+            Process the end of a string
+        """
+        self._in_string = False
+        if self._capture:
+            self._capture = False
+            self._target_next = False
+            self.found = True
+        else:
+            self.skeleton += b'"'
+            if self._key is not None:
+                self._last_string = bytes(self._key)
+                self._key = None
+
+    def result(self):
+        """
+            Decode the object once all the chunks are processed
+
+            :return: Decoded object, with the extracted field as a StreamedData object
+            :rtype: dict
+        """
+        value = simplejson.loads(bytes(self.skeleton))
+        if self.found and isinstance(value, dict):
+            value[self._field.decode('utf-8')] = StreamedData(self._buffer, self._escaped)
+        return value
+
+
+def decode_stream(chunks, field='data', buffer=None):
+    """
+        Decode a JSON object from a sequence of chunks, extracting a large string field without decoding it
+
+        :param chunks: Chunks of the document
+        :type chunks: iterable
+        :param field: Name of the top-level field to extract
+        :type field: str
+        :param buffer: Buffer for the field value. By default an in-memory buffer is used.
+        :type buffer: file
+        :return: Decoded object
+        :rtype: dict
+    """
+    chunks = iter(chunks)
+    extractor = None
+    head = b''
+    for chunk in chunks:
+        if extractor is None:
+            head += chunk
+            if len(head.lstrip()) == 0:
+                continue
+            if not head.lstrip().startswith(b'{'):
+                # Not a plain JSON object, as compressed objects or binary payloads. Decode it at once.
+                if buffer is not None:
+                    buffer.close()
+                return decode_payload(head + b''.join(chunks))
+            extractor = FieldExtractor(field, buffer)
+            chunk = head
+        extractor.feed(chunk)
+    if extractor is None:
+        return simplejson.loads(head)
+    value = extractor.result()
+    if buffer is not None and not extractor.found:
+        buffer.close()
+    return value
+
+
+def is_streaming_enabled():
+    """
+        Check if fetch_payload can provide the data of payloads as StreamedData objects, which hold an open buffer
+
+        :return: True if STORAGE_STREAMING or STORAGE_SPOOL_THRESHOLD are set
+        :rtype: bool
+    """
+    return config.get_bool('STORAGE_STREAMING', False) or config.get_int('STORAGE_SPOOL_THRESHOLD', 0) > 0
+
+
+def fetch_payload(url):
+    """
+        Download a sample or request payload from storage. Payloads in any of the formats supported by
+        decode_payload are accepted, and binary data stored in a separate object is downloaded. When
+        STORAGE_STREAMING is enabled and a JSON payload is larger than STORAGE_STREAMING_THRESHOLD bytes, it is
+        decoded while it is received, and the data field is provided as a StreamedData object instead of a string.
+        When STORAGE_SPOOL_THRESHOLD is set, the data field of larger JSON payloads is written to a temporary file
+        instead of memory.
+
+        :param url: Storage URL
+        :type url: str
+        :return: Decoded payload
+        :rtype: dict
+    """
+    streaming = config.get_bool('STORAGE_STREAMING', False)
+    spool_threshold = config.get_int('STORAGE_SPOOL_THRESHOLD', 0)
+    if not is_streaming_enabled():
+        return load_sidecar(url, decode_payload(*fetch_typed(url)))
+
+    data_resp = fetch(url, stream=True)
+    with data_resp:
+        if data_resp.status_code != 200:
+            raise StorageException(url, data_resp.status_code)
+        content_type = data_resp.headers.get('Content-Type')
+        length = data_resp.headers.get('Content-Length')
+        if length is not None:
+            length = int(length)
+        spool = spool_threshold > 0 and (length is None or length >= spool_threshold)
+        if not is_json_type(content_type) or (not spool and (not streaming or (
+                length is not None and length < config.get_int('STORAGE_STREAMING_THRESHOLD', 1024 * 1024)))):
+            return load_sidecar(url, decode_payload(data_resp.content, content_type))
+        buffer = None
+        if spool:
+            buffer = get_spool_file()
+        payload = decode_stream(data_resp.iter_content(chunk_size=CHUNK_SIZE), buffer=buffer)
+    return load_sidecar(url, payload)
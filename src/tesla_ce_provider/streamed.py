@@ -0,0 +1,103 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" TeSLA CE Provider streamed data module """
+import io
+import mmap
+import os
+import tempfile
+import simplejson
+
+
+class StreamedData:
+    """
+        Raw content of a large JSON string, kept as bytes in memory or spooled to a temporary file, and decoded on
+        demand
+    """
+
+    def __init__(self, buffer, escaped):
+        """
+            Create a streamed data object
+
+            :param buffer: Buffer with the raw content of the string, without quotes. It can be an in-memory buffer
+                           or a temporary file.
+            :type buffer: io.BytesIO | file
+            :param escaped: Whether the raw content contains JSON escape sequences
+            :type escaped: bool
+        """
+        self._buffer = buffer
+        self.escaped = escaped
+
+    @property
+    def spooled(self):
+        """
+            Check if the raw content is stored in a temporary file
+            :return: True if the content is in a file
+            :rtype: bool
+        """
+        return not isinstance(self._buffer, io.BytesIO)
+
+    def getbuffer(self):
+        """
+            Get a view of the raw content, without copying it. Spooled contents are memory mapped.
+            :return: Raw content of the string
+            :rtype: memoryview
+        """
+        if not self.spooled:
+            return self._buffer.getbuffer()
+        self._buffer.flush()
+        if os.fstat(self._buffer.fileno()).st_size == 0:
+            return memoryview(b'')
+        return memoryview(mmap.mmap(self._buffer.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        if self.spooled:
+            self._buffer.flush()
+            return os.fstat(self._buffer.fileno()).st_size
+        with self._buffer.getbuffer() as view:
+            return view.nbytes
+
+    def decode(self):
+        """
+            Decode the content as a string
+            :return: String value
+            :rtype: str
+        """
+        if self.escaped:
+            with self.getbuffer() as view:
+                return simplejson.loads(b'"' + bytes(view) + b'"')
+        with self.getbuffer() as view:
+            return str(view, 'utf-8')
+
+    def __str__(self):
+        return self.decode()
+
+    def close(self):
+        """
+            Release the raw content
+        """
+        self._buffer.close()
+
+
+def get_spool_file(suffix=None):
+    """
+        Create a temporary file for spooled payloads, in STORAGE_SPOOL_DIR if it is set. The file is removed when it
+        is closed.
+
+        :param suffix: File name suffix
+        :type suffix: str
+        :return: Temporary file with a name that can be used by external tools
+        :rtype: tempfile.NamedTemporaryFile
+    """
+    return tempfile.NamedTemporaryFile(dir=os.getenv('STORAGE_SPOOL_DIR', None) or None, suffix=suffix)
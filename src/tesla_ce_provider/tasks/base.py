@@ -13,18 +13,32 @@
 #      You should have received a copy of the GNU Affero General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Base Task module """
+import copy
+import hashlib
+import inspect
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import simplejson
 import sentry_sdk
 from sentry_sdk import capture_exception
 from sentry_sdk.integrations.celery import CeleryIntegration
 from celery import Task
+from celery.exceptions import Reject
+from tesla_ce_client.exception import BadRequestException, LockedResourceException
 from celery.utils.log import task_logger
-from ..provider.base import BaseProvider
+from ..provider.registry import get_provider, get_provider_footprint
 from ..provider.result import EnrolmentDelayedResult, VerificationDelayedResult, ValidationDelayedResult
-from ..celery_app import client
+from ..celery_app import get_client
 from ..models import parse_validation_data
 from ..models.base import Sample
+from ..storage import StorageException, StorageUnavailableException, fetch_json, fetch_content, prefetch, submit
+from ..storage import decompress, encode_json, get_model_codec, upload, fetch_payload, fetch_with_retry, get_retry_stats
+from ..storage import get_host_stats, get_model_store, is_streaming_enabled, StreamedData
+from ..message import Provider as ProviderMessage
+from .. import config
+from ..cache import CachedValue, LRUCache, SingleFlight
+from ..ratelimit import RateLimitedProxy, get_rate_limiter
+from ..context import get_context, start_context, end_context
 
 
 if os.getenv('SENTRY_ENABLED') in ['1', 1, 'True', 'yes', 'true'] and os.getenv('SENTRY_DSN') is not None:
@@ -38,6 +52,93 @@ if os.getenv('SENTRY_ENABLED') in ['1', 1, 'True', 'yes', 'true'] and os.getenv(
         server_name=os.getenv('SENTRY_SERVER_NAME', None)
     )
 
+# Enrolment endpoint of the TeSLA CE API used by client save_model to update the model metadata
+_ENROLMENT_MODEL_PATH = '/api/v2/provider/{}/enrolment/{}/'
+
+# Provider information and credentials, shared by all tasks in the process
+_provider_info = CachedValue(config.get_float('PROVIDER_INFO_TTL', 300))
+_provider_credentials = CachedValue(config.get_float('PROVIDER_INFO_TTL', 300))
+
+# Decoded learner models, shared by all tasks in the process. Disabled unless MODEL_CACHE_SIZE_MB is set. The budget
+# counts the size of the JSON content of the models, and decoded models use several times that memory.
+_model_cache = LRUCache(config.get_int('MODEL_CACHE_SIZE_MB', 0) * 1024 * 1024)
+
+# Storage downloads in progress, shared by concurrent tasks in the process
+_downloads = SingleFlight()
+
+# Tasks rescheduled after a storage error, once inline retries are exhausted
+_rescheduled = 0
+
+
+def _fetch_shared(fetch, url):
+    """
+        Download an object from storage, waiting for the download in progress if another task of the process is
+        already downloading the same object. Objects are identified by their URL without query string, as signed
+        storage URLs change on every request.
+
+        :param fetch: Storage function used to download the object
+        :type fetch: callable
+        :param url: Storage URL
+        :type url: str
+        :return: Value returned by the storage function, shared with concurrent callers
+    """
+    return _downloads.do((fetch.__name__, url.split('?')[0]), lambda: fetch_with_retry(fetch, url))
+
+
+def _fetch_json_shared(url):
+    """
+        Download a JSON object from storage, sharing concurrent downloads of the same object
+
+        :param url: Storage URL
+        :type url: str
+        :return: Decoded object
+        :rtype: dict
+    """
+    return _fetch_shared(fetch_json, url)
+
+
+def _fetch_payload_shared(url):
+    """
+        Download a sample or request payload from storage, sharing concurrent downloads of the same object. Each
+        caller receives its own copy of the payload object. Streamed payloads hold an open buffer that is closed
+        once it is read, therefore they are never shared.
+
+        :param url: Storage URL
+        :type url: str
+        :return: Decoded payload
+        :rtype: dict
+    """
+    if is_streaming_enabled():
+        return fetch_with_retry(fetch_payload, url)
+    return copy.deepcopy(_fetch_shared(fetch_payload, url))
+
+
+def _close_payload(future):
+    """
+        Release the buffers of a payload downloaded on background that is not used
+
+        :param future: Finished future of the download
+        :type future: concurrent.futures.Future
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    payload = future.result()
+    if isinstance(payload, dict) and isinstance(payload.get('data'), StreamedData):
+        payload['data'].close()
+
+
+class _LimitedClient:
+    """
+        TeSLA CE Client with rate limited provider API
+    """
+
+    def __init__(self, client, limiter):
+        self._client = client
+        self.provider = RateLimitedProxy(client.provider, limiter, 'provider')
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
 
 class BaseTask(Task):
     """ Base Task for TeSLA Providers """
@@ -45,14 +146,11 @@ class BaseTask(Task):
     # Instrument provider implementation -> BaseProvider
     _provider = None
 
-    # TeSLA Client
-    _client = client
-
-    # Current learner
-    _learner = None
+    # TeSLA Client. The client of the process is used if it is not set.
+    _client = None
 
-    # Whether model needs to be unlocked in case of failure
-    _unlock_on_failure = False
+    # Credentials and information applied to the provider instance
+    _provider_metadata = None
 
     @property
     def provider(self):
@@ -62,16 +160,20 @@ class BaseTask(Task):
             :rtype: BaseProvider
         """
         if self._provider is None:
-            self._provider = BaseProvider.get_provider()
+            # All the task types share the provider instance of the process
+            self._provider = get_provider()
             self._provider.set_logger(self.add_trace)
-        # Set required credentials
-        for key in self._provider.get_required_credentials():
-            value = self.client._find_config_value(key)
-            self._provider.set_credential(key, value)
-        # Update provider options
-        if self._provider is not None:
+            self._provider_metadata = None
+        # Provider is only updated when cached information changes
+        credentials = _provider_credentials.get(self._load_provider_credentials)
+        provider_info = self.get_provider_info()
+        if self._provider_metadata is None or self._provider_metadata[0] is not credentials or \
+                self._provider_metadata[1] is not provider_info:
+            # Set required credentials
+            for key, value in credentials.items():
+                self._provider.set_credential(key, value)
+            # Update provider options
             self._provider.provider_id = self.get_provider_id()
-            provider_info = self.get_provider_info()
             if provider_info is not None:
                 self._provider.instrument = {
                     'id': provider_info['instrument']['id'],
@@ -87,17 +189,69 @@ class BaseTask(Task):
                 }
                 if 'options' in provider_info:
                     self._provider.set_options(provider_info['options'])
+            self._provider_metadata = (credentials, provider_info)
 
         return self._provider
 
+    def _load_provider_credentials(self):
+        """
+            Read the credentials required by the provider from environment variables or secrets
+            :return: Credential values
+            :rtype: dict
+        """
+        credentials = {}
+        for key in self._provider.get_required_credentials():
+            credentials[key] = self.client._find_config_value(key)
+        return credentials
+
+    @staticmethod
+    def invalidate_provider_metadata():
+        """
+            Discard cached provider information and credentials. Next access will read them again for all the tasks
+            in this process.
+        """
+        _provider_info.invalidate()
+        _provider_credentials.invalidate()
+
+    @property
+    def context(self):
+        """
+            Access to the state of current invocation of the task
+            :return: Task context
+            :rtype: TaskContext
+        """
+        context = get_context()
+        if context is None:
+            context = start_context()
+        return context
+
     @property
     def client(self):
         """
-            Access to the TeSLA CE Client instance
+            Access to the TeSLA CE Client instance. When API rate limits are configured, calls to the provider API
+            wait for the rate limiter shared by the processes of the node (see RateLimiter).
             :return: Client instance
             :rtype: tesla_ce_client.Client
         """
-        return self._client
+        client = self._client
+        if client is None:
+            client = get_client()
+        limiter = get_rate_limiter()
+        if limiter is None or client is None:
+            return client
+        return _LimitedClient(client, limiter)
+
+    @staticmethod
+    def get_rate_limit_stats():
+        """
+            Get counters of the API calls limited in this process
+            :return: Counters of each endpoint, as provided by RateLimiter.stats
+            :rtype: dict
+        """
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return {}
+        return limiter.stats()
 
     def get_provider_id(self):
         """
@@ -105,7 +259,7 @@ class BaseTask(Task):
             :return: Provider ID
             :rtype: int
         """
-        return self._client._connector.get_provider_id()
+        return self.client._connector.get_provider_id()
 
     def get_provider_info(self):
         """
@@ -113,7 +267,7 @@ class BaseTask(Task):
             :return: Provider information
             :rtype: dict
         """
-        return self._client.provider.get(self.get_provider_id())
+        return _provider_info.get(lambda: self.client.provider.get(self.get_provider_id()))
 
     def get_provider_options(self):
         """
@@ -121,7 +275,7 @@ class BaseTask(Task):
             :return: Provider options
             :rtype: dict
         """
-        provider_info = self._client.provider.get(self.get_provider_id())
+        provider_info = self.get_provider_info()
         if provider_info is not None and 'options' in provider_info:
             return provider_info['options']
         return None
@@ -137,24 +291,123 @@ class BaseTask(Task):
             :rtype: list
         """
 
-        result = self._client.provider.enrolment.get_available_samples(self.get_provider_id(), learner_id)
+        result = self.client.provider.enrolment.get_available_samples(self.get_provider_id(), learner_id)
         if result is None or result['count'] == 0:
             return None
+        if config.get_bool('ENROLMENT_PREFETCH_PAGES', False):
+            # All pages are handled as a single stream, so next page is loaded while current one is consumed
+            pages = [self._get_pipelined_samples(result)]
+        else:
+            pages = self._get_sample_pages(result)
+
+        # Validations are loaded while pages are iterated, so their storage errors are also handled here
+        try:
+            for page in pages:
+                # Download data of the samples concurrently
+                samples = prefetch(page, self._load_enrolment_sample,
+                                   window=config.get_int('ENROLMENT_PREFETCH_WINDOW', 8),
+                                   workers=config.get_int('ENROLMENT_PREFETCH_WORKERS', 4))
+                for sample in samples:
+                    yield Sample(sample)
+        except StorageException as exc:
+            self._reschedule(exc)
+
+    def _get_sample_pages(self, result):
+        """
+            Iterate over the pages of a list of samples. Next page is requested once current page has been consumed.
+
+            :param result: First page of the list
+            :type result: dict
+            :return: Generator of pages, each one a list of samples
+        """
         while result is not None:
-            page = []
-            # Read data for each sample
-            for sample in result['results']:
-                # Get the validations
-                sample['validations'] = self.get_sample_validations(sample)
-                # Get the data
-                sample_data = self.get_sample_data(sample['data'])
-                sample['data'] = sample_data
-                page.append(sample)
-            for sample in page:
-                yield Sample(sample)
+            self._load_page_validations(result['results'])
+            yield result['results']
 
             # Move to next page
-            result = self._client.get_next(result)
+            result = self.client.get_next(result)
+
+    def _get_pipelined_samples(self, result):
+        """
+            Iterate over all the samples in a list of samples. Next page and its validations are loaded on
+            background as soon as current page is received.
+
+            :param result: First page of the list
+            :type result: dict
+            :return: Generator of samples
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tesla_ce_pages')
+        next_page = None
+        try:
+            self._load_page_validations(result['results'])
+            while result is not None:
+                next_page = executor.submit(self._load_next_page, result)
+                yield from result['results']
+
+                # Move to next page
+                result = next_page.result()
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+            executor.shutdown(wait=True)
+
+    def _load_next_page(self, result):
+        """
+            Request the next page of a list of samples and load its validations. This method is called from a
+            background thread, therefore storage errors are raised instead of scheduling a retry.
+
+            :param result: Current page of the list
+            :type result: dict
+            :return: Next page, or None if current page is the last one
+            :rtype: dict
+        """
+        page = self.client.get_next(result)
+        if page is not None:
+            self._load_page_validations(page['results'])
+        return page
+
+    def _load_page_validations(self, samples):
+        """
+            Get the validations of a page of samples in one pass. Validation lists of all the samples are requested
+            concurrently, and then the information of all the validations is downloaded concurrently. Storage errors
+            are raised instead of scheduling a retry.
+
+            :param samples: List of sample objects. Parsed validations are set on each sample.
+            :type samples: list
+        """
+        if len(samples) == 0:
+            return
+        provider_id = self.get_provider_id()
+        workers = config.get_int('ENROLMENT_PREFETCH_WORKERS', 4)
+        validation_lists = list(prefetch(
+            samples,
+            lambda sample: self.client.provider.enrolment.get_sample_validation_list(provider_id,
+                                                                                     sample['learner_id'],
+                                                                                     sample['id']),
+            window=len(samples), workers=workers))
+
+        validations = [validation for validation_list in validation_lists for validation in validation_list['results']
+                       if validation.get('info') is not None]
+        infos = prefetch([validation['info'] for validation in validations], _fetch_json_shared,
+                         window=max(1, len(validations)), workers=workers)
+        for validation, info in zip(validations, infos):
+            validation['info'] = info
+
+        for sample, validation_list in zip(samples, validation_lists):
+            sample['validations'] = list(self._parse_sample_validations(validation_list, lambda info: info))
+
+    def _load_enrolment_sample(self, sample):
+        """
+            Download the data of an enrolment sample. Validations are loaded for each page of samples. This method is
+            called from prefetch threads, therefore storage errors are raised instead of scheduling a retry.
+
+            :param sample: A sample object
+            :type sample: dict
+            :return: Sample object with data and validations
+            :rtype: dict
+        """
+        sample['data'] = _fetch_payload_shared(sample['data'])
+        return sample
 
     def get_sample_data(self, url):
         """
@@ -164,13 +417,147 @@ class BaseTask(Task):
             :return: Sample data
             :rtype: dict
         """
-        if os.getenv('SSL_VERIFY', True) in ['False', 'false', 0, False, '0']:
-            data_resp = requests.get(url, verify=False)
-        else:
-            data_resp = requests.get(url)
-        if data_resp.status_code != 200:
-            self.retry(countdown=5 * 60, max_retries=3)
-        return data_resp.json()
+        return self._download(_fetch_payload_shared, url)
+
+    def _download_json(self, url):
+        """
+            Download a JSON object from storage using the pooled session of this worker process. Task is scheduled
+            for retry if storage does not return the object.
+
+            :param url: Storage URL
+            :type url: str
+            :return: Decoded object
+            :rtype: dict
+        """
+        return self._download(_fetch_json_shared, url)
+
+    def _download(self, fetch, url):
+        """
+            Download an object from storage. Task is scheduled for retry if storage does not return the object.
+
+            :param fetch: Storage function used to download the object
+            :type fetch: callable
+            :param url: Storage URL
+            :type url: str
+            :return: Value returned by the storage function
+        """
+        try:
+            return fetch(url)
+        except StorageException as exc:
+            self._reschedule(exc)
+
+    def _reschedule(self, exc):
+        """
+            Schedule the task for retry after a storage error. The task is retried after STORAGE_RETRY_COUNTDOWN
+            seconds, at most STORAGE_RETRY_MAX times. When the storage host is not available, the error is raised
+            again instead, so the task fails fast.
+
+            :param exc: Storage error
+            :type exc: StorageException
+        """
+        global _rescheduled
+        if isinstance(exc, StorageUnavailableException):
+            raise exc
+        _rescheduled += 1
+        self.retry(countdown=config.get_int('STORAGE_RETRY_COUNTDOWN', 5 * 60),
+                   max_retries=config.get_int('STORAGE_RETRY_MAX', 3))
+
+    def __call__(self, *args, **kwargs):
+        """
+            Run the task in a new context. Tasks failing because the storage host is not available are rejected with
+            PROVIDER_EXTERNAL_SERVICE_DOWN, after calling on_storage_unavailable.
+        """
+        start_context()
+        try:
+            return super().__call__(*args, **kwargs)
+        except StorageUnavailableException as exc:
+            self.add_trace('Storage is not available: {}'.format(exc))
+            arguments = inspect.signature(self.run).bind_partial(*args, **kwargs).arguments
+            self.on_storage_unavailable(exc, arguments)
+            if self.context.unlock_on_failure and self.context.learner is not None:
+                self.client.provider.enrolment.unlock_model(self.get_provider_id(), self.context.learner,
+                                                            self.request.id)
+            raise Reject('{}: {}'.format(ProviderMessage.PROVIDER_EXTERNAL_SERVICE_DOWN.value, exc), requeue=False)
+
+    def on_storage_unavailable(self, exc, arguments):
+        """
+            Report a task that cannot be completed because the storage host is not available. By default nothing is
+            reported.
+
+            :param exc: Storage error
+            :type exc: StorageUnavailableException
+            :param arguments: Arguments of the task, by name
+            :type arguments: dict
+        """
+        pass
+
+    @staticmethod
+    def get_provider_footprint():
+        """
+            Get the resources used to create the provider instance shared by the tasks of this process
+            :return: Provider footprint, as provided by get_provider_footprint of the provider package
+            :rtype: dict
+        """
+        return get_provider_footprint()
+
+    @staticmethod
+    def get_storage_host_stats():
+        """
+            Get counters of the storage hosts used by this process, with the circuit breaker state and the hedged
+            requests
+            :return: Counters of each host
+            :rtype: dict
+        """
+        return get_host_stats()
+
+    @staticmethod
+    def get_retry_stats():
+        """
+            Get storage retry counters of this process, for both retry tiers
+            :return: Inline retry counters, as provided by get_retry_stats of the storage package, and the number of
+                     tasks rescheduled (rescheduled)
+            :rtype: dict
+        """
+        stats = get_retry_stats()
+        stats['rescheduled'] = _rescheduled
+        return stats
+
+    def _start_download(self, url):
+        """
+            Start downloading a sample or request payload from storage on background
+
+            :param url: Storage URL
+            :type url: str
+            :return: Future for the decoded payload
+            :rtype: concurrent.futures.Future
+        """
+        return submit(_fetch_payload_shared, url)
+
+    @staticmethod
+    def _discard_download(future):
+        """
+            Cancel a background download that is not needed anymore. If it is already running, the buffers of the
+            payload are released once it finishes.
+
+            :param future: Future returned by _start_download
+            :type future: concurrent.futures.Future
+        """
+        if not future.cancel():
+            future.add_done_callback(_close_payload)
+
+    def _wait_download(self, future):
+        """
+            Wait for a background download. Task is scheduled for retry if storage did not return the object.
+
+            :param future: Future returned by _start_download
+            :type future: concurrent.futures.Future
+            :return: Decoded object
+            :rtype: dict
+        """
+        try:
+            return future.result()
+        except StorageException as exc:
+            self._reschedule(exc)
 
     def get_sample_validations(self, sample):
         """
@@ -183,9 +570,22 @@ class BaseTask(Task):
         validations = self.client.provider.enrolment.get_sample_validation_list(self.get_provider_id(),
                                                                                 sample['learner_id'],
                                                                                 sample['id'])
+        return self._parse_sample_validations(validations, self._download_json)
+
+    @staticmethod
+    def _parse_sample_validations(validations, download):
+        """
+            Download and parse the information of a list of validations
+
+            :param validations: List of validations returned by the API
+            :type validations: dict
+            :param download: Function used to download validation information from storage
+            :type download: callable
+            :return: Validation generator
+        """
         for validation in validations['results']:
             if 'info' in validation and validation['info'] is not None:
-                data = self.get_sample_data(validation['info'])
+                data = download(validation['info'])
                 validation['info'] = data
                 validation_data = parse_validation_data(data)
                 if validation_data is not None:
@@ -201,21 +601,166 @@ class BaseTask(Task):
         """
         return self.get_sample_data(url)
 
-    def get_model_data(self, url):
+    def get_model_data(self, url, learner_id=None, version=None):
         """
-            Download model data from storage url
+            Download model data from storage url. When the learner is provided and MODEL_CACHE_SIZE_MB is set, the
+            decoded model is kept in a cache shared by all the tasks in the process, keyed by learner, model URL and
+            model version. Cached models are shared, therefore the cache must only be enabled for providers that do
+            not modify the model they receive. The cache budget counts the size of the JSON content of the models,
+            not the memory used by the decoded objects, which is several times larger. If MODEL_STORE_DIR is set,
+            the model content is also kept in a store shared by all the processes in the node.
             :param url: Storage URL
             :type url: str
+            :param learner_id: The learner UUID
+            :type learner_id: str
+            :param version: Model version, as returned by get_model_version
+            :type version: str
             :return: Model data
             :rtype: dict
         """
-        if os.getenv('SSL_VERIFY', True) in ['False', 'false', 0, False, '0']:
-            data_resp = requests.get(url, verify=False)
+        if learner_id is None:
+            return self._download_json(url)
+
+        key = (str(learner_id), url.split('?')[0], version)
+        model_data = _model_cache.get(key)
+        if model_data is not None:
+            self.add_trace('Model data loaded from cache.')
+            return model_data
+
+        try:
+            # Concurrent tasks of the process loading the same model wait for a single load
+            model_data, stored = _downloads.do(key, lambda: self._load_model(url, key, version))
+        except StorageException as exc:
+            self._reschedule(exc)
+        if stored:
+            self.add_trace('Model data loaded from node store.')
+        return model_data
+
+    @staticmethod
+    def _load_model(url, key, version):
+        """
+            Load a model from the node store or from storage, and add it to the model cache. Storage errors are
+            raised instead of scheduling a retry.
+
+            :param url: Storage URL
+            :type url: str
+            :param key: Model cache key
+            :type key: tuple
+            :param version: Model version
+            :type version: str
+            :return: Tuple with the model data and whether it was loaded from the node store
+            :rtype: tuple
+        """
+        # Look for the model in the store shared by all the processes in this node
+        store = get_model_store()
+        stored = None
+        if store is not None:
+            stored = store.get(key[1], version)
+        if stored is not None:
+            model_data, size = stored
+        else:
+            content = fetch_with_retry(fetch_content, url)
+            if store is not None:
+                store.put(key[1], version, content)
+            content = decompress(content)
+            model_data = simplejson.loads(content)
+            size = len(content)
+        _model_cache.put(key, model_data, size)
+        return model_data, stored is not None
+
+    @staticmethod
+    def get_model_version(model):
+        """
+            Get a version identifier for a learner model, which changes every time the model is updated
+            :param model: Learner model as returned by the API
+            :type model: dict
+            :return: Model version
+            :rtype: str
+        """
+        for key in ['updated_at', 'modified', 'version']:
+            if model.get(key) is not None:
+                return str(model[key])
+        used_samples = ','.join(str(sample) for sample in model.get('used_samples') or [])
+        return '{}:{}'.format(model.get('percentage'), hashlib.sha1(used_samples.encode('utf-8')).hexdigest())
+
+    def save_model(self, learner_id, model):
+        """
+            Store a learner model. When MODEL_COMPRESSION is set, model data larger than MODEL_COMPRESSION_THRESHOLD
+            is uploaded compressed. Models stored without compression are still read by get_model_data.
+            :param learner_id: The learner UUID
+            :type learner_id: str
+            :param model: Learner model, with the new model data
+            :type model: dict
+        """
+        content, codec = None, None
+        if get_model_codec() is not None:
+            content, codec = encode_json(model['model'])
+        if codec is None:
+            self.client.provider.enrolment.save_model(self.get_provider_id(), learner_id, self.request.id, model)
+        else:
+            self._save_compressed_model(learner_id, model, content)
+        self.invalidate_model_cache(learner_id)
+
+    def _save_compressed_model(self, learner_id, model, content):
+        """
+            Store a learner model with compressed model data, following the same steps than client save_model. The
+            model metadata update uses the rate limit budget of save_model.
+            :param learner_id: The learner UUID
+            :type learner_id: str
+            :param model: Learner model, with the new model data
+            :type model: dict
+            :param content: Compressed model data
+            :type content: bytes
+        """
+        connector = self.client._connector
+        resp = upload(model['model_upload_url'], content)
+        connector._check_response_status(resp.status_code, resp.content)
+
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            limiter.acquire('save_model')
+        try:
+            connector.put(_ENROLMENT_MODEL_PATH.format(self.get_provider_id(), str(learner_id)), body={
+                'learner_id': str(learner_id),
+                'task_id': self.request.id,
+                'percentage': model['percentage'],
+                'can_analyse': model['can_analyse'],
+                'used_samples': model['used_samples']
+            })
+        except BadRequestException as exc:
+            if 'Model is locked' in str(exc.value):
+                raise LockedResourceException("Model is locked")
+            raise
+
+    @staticmethod
+    def invalidate_model_cache(learner_id=None):
+        """
+            Remove learner models from the model cache of this process
+            :param learner_id: The learner UUID. If not provided, all the models are removed.
+            :type learner_id: str
+        """
+        if learner_id is None:
+            _model_cache.invalidate()
         else:
-            data_resp = requests.get(url)
-        if data_resp.status_code != 200:
-            self.retry(countdown=5 * 60, max_retries=3)
-        return data_resp.json()
+            _model_cache.invalidate(lambda key: key[0] == str(learner_id))
+
+    @staticmethod
+    def get_model_cache_stats():
+        """
+            Get usage counters of the model cache of this process
+            :return: Cache counters (hits, misses, evictions, entries, size and max_size)
+            :rtype: dict
+        """
+        return _model_cache.stats()
+
+    @staticmethod
+    def get_download_stats():
+        """
+            Get counters of the storage downloads shared between concurrent tasks of this process
+            :return: Download counters, as provided by SingleFlight.stats
+            :rtype: dict
+        """
+        return _downloads.stats()
 
     def send_notifications(self):
         """
@@ -268,8 +813,7 @@ class BaseTask(Task):
 
                 # Store new model
                 self.add_trace('EnrolmentTask: Saving new model')
-                self.client.provider.enrolment.save_model(self.get_provider_id(), delayed_result.learner_id,
-                                                          self.request.id, model)
+                self.save_model(delayed_result.learner_id, model)
 
             if isinstance(delayed_result, VerificationDelayedResult):
                 self.client.provider.verification.set_provider_request_result(provider_id=self.get_provider_id(),
@@ -293,8 +837,26 @@ class BaseTask(Task):
         :param einfo:
         """
         self.capture_exception(exc)
-        if self._unlock_on_failure and self._learner is not None:
-            self.client.provider.enrolment.unlock_model(self.get_provider_id(), self._learner, self.request.id)
+        if self.context.unlock_on_failure and self.context.learner is not None:
+            self.client.provider.enrolment.unlock_model(self.get_provider_id(), self.context.learner,
+                                                        self.request.id)
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        """
+            Discard the context of the finished invocation
+
+            :param status: Current task state
+            :type status: str
+            :param retval: Task return value or exception
+            :param task_id: The task identifier
+            :type task_id: uuid
+            :param args: Original arguments for the task
+            :type args: tuple
+            :param kwargs: Original keyword arguments for the task
+            :type kwargs: dict
+            :param einfo: Exception information
+        """
+        end_context()
 
     @staticmethod
     def capture_exception(exception):
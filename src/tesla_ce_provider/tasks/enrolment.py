@@ -13,7 +13,7 @@
 #      You should have received a copy of the GNU Affero General Public License
 #      along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """ TeSLA CE Enrolment related tasks module """
-from celery.exceptions import Reject
+from celery.exceptions import Reject, Retry
 from tesla_ce_client.exception import LockedResourceException
 from tesla_ce_client.provider.enrolment import SampleValidationStatus
 from ..provider.result import EnrolmentDelayedResult
@@ -24,6 +24,8 @@ from ..provider.result import ValidationResult
 from .base import BaseTask
 from ..celery_app import app
 from ..models.base import Sample
+from ..message import Provider as ProviderMessage
+from ..storage import StorageException
 
 
 class EnrolmentTask(BaseTask):
@@ -32,8 +34,8 @@ class EnrolmentTask(BaseTask):
 
     def run(self, learner_id, sample_id=None):
         # Store the context
-        self._learner = learner_id
-        self._unlock_on_failure = False
+        self.context.learner = learner_id
+        self.context.unlock_on_failure = False
         model = None
 
         self.add_trace('EnrolmentTask: Start running task {}.'.format(self.request.id))
@@ -42,7 +44,7 @@ class EnrolmentTask(BaseTask):
         try:
             model = self.client.provider.enrolment.get_model_lock(self.client._connector.get_provider_id(),
                                                                   learner_id, self.request.id)
-            self._unlock_on_failure = True
+            self.context.unlock_on_failure = True
             self.add_trace('EnrolmentTask: Model ready for modification.')
         except LockedResourceException:
             # Model is locked by another task
@@ -74,10 +76,18 @@ class EnrolmentTask(BaseTask):
             self.add_trace('EnrolmentTask: enrolment done: [valid={}, percentage={}, samples={}]'.format(
                 enrol_response.percentage, enrol_response.percentage, enrol_response.used_samples
             ))
+        except Retry:
+            # Samples could not be downloaded and the task is scheduled for retry
+            if self.context.unlock_on_failure:
+                self.client.provider.enrolment.unlock_model(self.get_provider_id(), learner_id, self.request.id)
+            raise
+        except StorageException:
+            # Storage is not available. Task is rejected by BaseTask, which unlocks the model.
+            raise
         except Exception as exc:
             self.add_trace('EnrolmentTask: exception detected. {}'.format(exc.__str__()))
             self.capture_exception(exc)
-            if self._unlock_on_failure:
+            if self.context.unlock_on_failure:
                 self.client.provider.enrolment.unlock_model(self.get_provider_id(), learner_id, self.request.id)
             raise Reject('Exception from provider: ' + exc.__str__())
 
@@ -90,8 +100,7 @@ class EnrolmentTask(BaseTask):
 
             # Store new model
             self.add_trace('EnrolmentTask: Saving new model')
-            self.client.provider.enrolment.save_model(self.get_provider_id(), learner_id,
-                                                      self.request.id, model)
+            self.save_model(learner_id, model)
             self.add_trace('EnrolmentTask: New model saved')
         elif isinstance(enrol_response, EnrolmentDelayedResult):
             self.client.provider.enrolment.set_sample_status(provider_id=self.get_provider_id(), learner_id=learner_id,
@@ -123,8 +132,8 @@ class ValidationTask(BaseTask):
 
     def run(self, learner_id, sample_id, validation_id):
         # Store the context
-        self._learner = learner_id
-        self._unlock_on_failure = False
+        self.context.learner = learner_id
+        self.context.unlock_on_failure = False
 
         # Get Sample information
         sample = self.client.provider.enrolment.get_sample_validation(self.get_provider_id(), learner_id,
@@ -164,6 +173,21 @@ class ValidationTask(BaseTask):
         self.send_notifications()
         self.add_trace('ValidationTask: End task')
 
+    def on_storage_unavailable(self, exc, arguments):
+        """
+            Store an error result for the sample validation, as storage is not available
+
+            :param exc: Storage error
+            :type exc: StorageUnavailableException
+            :param arguments: Arguments of the task, by name
+            :type arguments: dict
+        """
+        validation_result = ValidationResult(False, error_message=str(exc),
+                                             message_code_id=ProviderMessage.PROVIDER_EXTERNAL_SERVICE_DOWN.value)
+        self.client.provider.enrolment.set_sample_validation(self.get_provider_id(), arguments['learner_id'],
+                                                             arguments['sample_id'], arguments['validation_id'],
+                                                             validation_result.json())
+
 
 EnrolmentTask = app.register_task(EnrolmentTask())
 ValidationTask = app.register_task(ValidationTask())
@@ -31,8 +31,8 @@ class NotificationTask(BaseTask):
             :type notification_id: int
         """
         # Store the context
-        self._unlock_on_failure = False
-        self._learner = None
+        self.context.unlock_on_failure = False
+        self.context.learner = None
 
         # Get notification
         try:
@@ -21,6 +21,8 @@ from ..celery_app import app
 from ..provider.result import VerificationDelayedResult
 from ..provider.result import VerificationResult
 from ..models.base import Request
+from ..message import Provider as ProviderMessage
+from .. import config
 from tesla_ce_client.provider.verification import RequestResultStatus
 
 
@@ -38,8 +40,8 @@ class VerificationTask(BaseTask):
             :type result_id: int
         """
         # Store the context
-        self._unlock_on_failure = False
-        self._learner = None
+        self.context.unlock_on_failure = False
+        self.context.learner = None
 
         # Get request result
         try:
@@ -49,32 +51,65 @@ class VerificationTask(BaseTask):
         except ObjectNotFoundException:
             raise Reject('Request not found')
 
-        # is this provider require_enrolment and model_data is needed?
-        provider = self.client.provider.get(self.client._connector.get_provider_id())
-        model_data = None
-        if provider['instrument']['requires_enrolment'] is True:
-            # Download learner model
-            try:
-                model = self.client.provider.enrolment.get_model(
-                    self.client._connector.get_provider_id(), request['learner_id']
-                )
-            except ObjectNotFoundException:
-                raise Reject('Model not found')
-
-            if not model['can_analyse']:
-                self.retry(countdown=120)
-
-            # Get model data
-            model_data = self.get_model_data(model['model'])
-
-        # Download request data
-        request['request']['data'] = self.get_request_data(request['request']['data'])
-
-        # Perform enrolment process
+        # Run the pre-check of the provider, if available, before retrieving the model
+        verify_response = None
+        request_object = None
+        request_data = None
         try:
-            verify_response = self.provider.verify(Request(request), model=model_data)
-        except Exception as exc:
-            raise Reject('Exception from provider: ' + exc.__str__())
+            if self.provider.has_precheck():
+                request['request']['data'] = self._get_request_payload(request)
+                request_object = Request(request)
+                try:
+                    verify_response = self.provider.precheck(request_object)
+                except Exception as exc:
+                    raise Reject('Exception from provider: ' + exc.__str__())
+                if isinstance(verify_response, VerificationResult):
+                    self.add_trace('VerificationTask: Request resolved by pre-check.')
+                else:
+                    verify_response = None
+
+            if verify_response is None:
+                # is this provider require_enrolment and model_data is needed?
+                provider = self.get_provider_info()
+                model_data = None
+                if provider['instrument']['requires_enrolment'] is True:
+                    # Download learner model
+                    try:
+                        model = self.client.provider.enrolment.get_model(
+                            self.client._connector.get_provider_id(), request['learner_id']
+                        )
+                    except ObjectNotFoundException:
+                        raise Reject('Model not found')
+
+                    if not model['can_analyse']:
+                        self.retry(countdown=120)
+
+                    # Download request data on background while the model data is retrieved
+                    if request_object is None and config.get_bool('VERIFICATION_CONCURRENT_FETCH', True):
+                        request_data = self._start_download(request['request']['data'])
+
+                    # Get model data
+                    model_data = self.get_model_data(model['model'], learner_id=request['learner_id'],
+                                                     version=self.get_model_version(model))
+
+                # Download request data
+                if request_object is None:
+                    request['request']['data'] = self._get_request_payload(request, request_data)
+                    request_data = None
+                    request_object = Request(request)
+
+                # Perform enrolment process
+                try:
+                    verify_response = self.provider.verify(request_object, model=model_data)
+                except Exception as exc:
+                    raise Reject('Exception from provider: ' + exc.__str__())
+        finally:
+            # Background download is not used if the model could not be retrieved
+            if request_data is not None:
+                self._discard_download(request_data)
+            # Release spooled request data and decoded temporary files
+            if request_object is not None:
+                request_object.close()
 
         if isinstance(verify_response, VerificationResult):
             # Store verification result
@@ -103,5 +138,35 @@ class VerificationTask(BaseTask):
         self.send_notifications()
         self.add_trace('VerificationTask: End task')
 
+    def on_storage_unavailable(self, exc, arguments):
+        """
+            Store an error result for the request, as storage is not available
+
+            :param exc: Storage error
+            :type exc: StorageUnavailableException
+            :param arguments: Arguments of the task, by name
+            :type arguments: dict
+        """
+        verify_response = VerificationResult(False, error_message=str(exc),
+                                             message_code=ProviderMessage.PROVIDER_EXTERNAL_SERVICE_DOWN.value)
+        self.client.provider.verification.set_provider_request_result(self.get_provider_id(),
+                                                                      arguments['request_id'],
+                                                                      verify_response.json())
+
+    def _get_request_payload(self, request, request_data=None):
+        """
+            Get the content of a verification request
+
+            :param request: Verification request
+            :type request: dict
+            :param request_data: Future of a background download started for this request, if any
+            :type request_data: concurrent.futures.Future
+            :return: Request data
+            :rtype: dict
+        """
+        if request_data is not None:
+            return self._wait_download(request_data)
+        return self.get_request_data(request['request']['data'])
+
 
 VerificationTask = app.register_task(VerificationTask())
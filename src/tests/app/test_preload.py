@@ -0,0 +1,34 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for the provider preload on worker start """
+import importlib
+import os
+
+
+def test_preload_on_worker_start(base_test_provider_class, mocker):
+    from celery.signals import worker_init
+
+    celery_app = importlib.import_module('tesla_ce_provider.celery_app')
+    preload = mocker.patch.object(celery_app.registry, 'preload_provider', return_value=0.5)
+
+    # Provider is not preloaded by default
+    mocker.patch.dict(os.environ, {'PROVIDER_PRELOAD': ''})
+    worker_init.send(sender=None)
+    preload.assert_not_called()
+
+    # Provider is preloaded in the parent worker process when PROVIDER_PRELOAD is enabled
+    mocker.patch.dict(os.environ, {'PROVIDER_PRELOAD': '1'})
+    worker_init.send(sender=None)
+    preload.assert_called_once()
@@ -0,0 +1,37 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for the queues of the Celery application """
+import importlib
+
+
+def test_declare_queues_on_worker_start(base_test_provider_class, mocker):
+    from celery.signals import celeryd_init
+
+    celery_app = importlib.import_module('tesla_ce_provider.celery_app')
+    # Load the configuration before the client is replaced
+    task_queues = celery_app.app.conf.task_queues
+    client = mocker.Mock(module={'provider_queue': 'tesla_fr, tesla_fr_2'})
+    mocker.patch.object(celery_app, 'get_client', return_value=client)
+    connection = mocker.patch.object(celery_app.app, 'broker_connection')
+
+    # Queues are declared when the worker starts, before it sets up its consumers
+    try:
+        celeryd_init.send(sender='worker@test', instance=None, conf=celery_app.app.conf, options={})
+        queues = celery_app.app.conf.task_queues
+    finally:
+        celery_app.app.conf.task_queues = task_queues
+    assert [queue.name for queue in queues] == ['tesla_fr', 'tesla_fr_2']
+    channel = connection.return_value.__enter__.return_value.default_channel
+    assert [call.kwargs['queue'] for call in channel.queue_declare.call_args_list] == ['tesla_fr', 'tesla_fr_2']
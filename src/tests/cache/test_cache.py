@@ -0,0 +1,98 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for in-process caches """
+
+
+def test_lru_cache_budget(base_test_provider_class):
+    from tesla_ce_provider.cache import LRUCache
+
+    cache = LRUCache(100)
+    cache.put(('learner1', 'model', 'v1'), {'a': 1}, 60)
+    cache.put(('learner2', 'model', 'v1'), {'b': 2}, 30)
+    assert cache.get(('learner1', 'model', 'v1')) == {'a': 1}
+
+    # Least recently used entry is evicted when the budget is exceeded
+    cache.put(('learner3', 'model', 'v1'), {'c': 3}, 30)
+    assert cache.get(('learner2', 'model', 'v1')) is None
+    assert cache.get(('learner1', 'model', 'v1')) is not None
+
+    # Entries larger than the budget are never stored
+    cache.put(('learner4', 'model', 'v1'), {'d': 4}, 101)
+    assert cache.get(('learner4', 'model', 'v1')) is None
+
+    cache.invalidate(lambda key: key[0] == 'learner1')
+    assert cache.get(('learner1', 'model', 'v1')) is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 3
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 1
+    assert stats['size'] == 30
+
+
+def test_cached_value_ttl(base_test_provider_class, mocker):
+    from tesla_ce_provider.cache import CachedValue
+
+    loader = mocker.Mock(side_effect=[1, 2, 3])
+    value = CachedValue(60)
+    assert value.get(loader) == 1
+    assert value.get(loader) == 1
+    value.invalidate()
+    assert value.get(loader) == 2
+
+    # A value without time to live is loaded on every access
+    value = CachedValue(0)
+    assert value.get(loader) == 3
+    assert loader.call_count == 3
+
+
+def test_single_flight(base_test_provider_class):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from tesla_ce_provider.cache import SingleFlight
+
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'model': 1}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, 'model', load)
+        started.wait(5)
+        waiters = [executor.submit(flights.do, 'model', load) for _ in range(3)]
+        # Wait until all the callers are waiting for the call in progress
+        deadline = time.monotonic() + 5
+        while flights.stats()['shared'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in [leader] + waiters]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    stats = flights.stats()
+    assert stats['in_flight'] == 0
+    assert stats['keys']['model'] == {'calls': 1, 'waiters': 3, 'max_waiters': 3}
+
+    # Finished calls are not shared
+    assert flights.do('model', lambda: 2) == 2
+    assert flights.stats()['calls'] == 2
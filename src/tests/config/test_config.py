@@ -0,0 +1,29 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for configuration values """
+import os
+
+
+def test_int_list(base_test_provider_class, mocker):
+    from tesla_ce_provider import config
+
+    mocker.patch.dict(os.environ, {'TEST_INT_LIST': '500, 502,,503'})
+    assert config.get_int_list('TEST_INT_LIST', [429]) == [500, 502, 503]
+
+    # Empty values use the default, as other configuration values do
+    mocker.patch.dict(os.environ, {'TEST_INT_LIST': ''})
+    assert config.get_int_list('TEST_INT_LIST', [429]) == [429]
+    mocker.patch.dict(os.environ, {'TEST_INT_LIST': ','})
+    assert config.get_int_list('TEST_INT_LIST', [429]) == []
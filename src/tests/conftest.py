@@ -51,3 +51,26 @@ def base_test_provider_class(mocker):
     from tesla_ce_provider import BaseProvider
 
     return BaseProvider
+
+
+@pytest.fixture
+def tesla_ce_task_client(base_test_provider_class, mocker):
+    from tesla_ce_provider.tasks.base import BaseTask
+
+    # All the tasks use a mocked TeSLA CE client
+    client = mocker.MagicMock()
+    client._connector.get_provider_id.return_value = 15
+    client.provider.get.return_value = {
+        'name': 'Test Provider',
+        'description': 'Provider used by tests',
+        'url': 'https://www.tesla-ce.eu',
+        'version': '1.0.0',
+        'acronym': 'test',
+        'instrument': {'id': 1, 'acronym': 'fr', 'requires_enrolment': True}
+    }
+    mocker.patch.object(BaseTask, '_client', client)
+    BaseTask.invalidate_provider_metadata()
+
+    yield client
+
+    BaseTask.invalidate_provider_metadata()
@@ -0,0 +1,43 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for task invocation context """
+import threading
+
+
+def test_provider_lists_per_invocation(base_test_provider_class):
+    from tesla_ce_provider.context import start_context, end_context, get_context
+
+    provider = base_test_provider_class()
+    ready = threading.Barrier(2)
+    results = {}
+
+    def invocation(name):
+        start_context()
+        provider.update_delayed_result(name)
+        provider.update_or_create_notification(name)
+        # Both invocations have added their results before reading them
+        ready.wait(5)
+        results[name] = (list(provider.delayed_results), list(provider.notifications))
+        end_context()
+
+    threads = [threading.Thread(target=invocation, args=(name, )) for name in ['first', 'second']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {'first': (['first'], ['first']), 'second': (['second'], ['second'])}
+    assert get_context() is None
+    assert provider.delayed_results == []
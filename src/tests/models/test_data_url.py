@@ -0,0 +1,75 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for data URL decoding on samples and requests """
+import base64
+import os
+import simplejson
+
+
+def test_data_url_decoding(base_test_provider_class):
+    from tesla_ce_provider.models.base import Sample, Request
+
+    content = os.urandom(512)
+    data_url = 'data:image/png;base64,' + base64.b64encode(content).decode('utf-8')
+
+    sample = Sample({'sample': {'data': {'data': data_url, 'metadata': {'mimetype': 'image/jpeg'}}}})
+    assert sample.data_bytes == content
+    assert sample.data_bytes is sample.data_bytes
+    assert sample.data_view.tobytes() == content
+    assert sample.data_mimetype == 'image/png'
+
+    # Without data URL header, content is base64 and mime type is taken from metadata
+    request = Request({'request': {'data': {'data': base64.b64encode(content).decode('utf-8'),
+                                            'metadata': {'mimetype': 'audio/wav'}}}})
+    assert request.data_bytes == content
+    assert request.data_mimetype == 'audio/wav'
+
+    assert Sample({'data': {}}).data_bytes is None
+
+
+def test_spooled_request_data_file(base_test_provider_class):
+    from tesla_ce_provider.models.base import Request
+    from tesla_ce_provider.storage import decode_stream
+    from tesla_ce_provider.storage.streaming import get_spool_file
+
+    content = os.urandom(4096)
+    document = simplejson.dumps({
+        'data': 'data:video/mp4;base64,' + base64.b64encode(content).decode('utf-8'),
+        'metadata': {'mimetype': 'video/webm'},
+    }).encode('utf-8')
+
+    data = decode_stream([document[pos:pos + 100] for pos in range(0, len(document), 100)], buffer=get_spool_file())
+    assert data['data'].spooled
+
+    request = Request({'request': {'data': data}})
+    assert request.data_mimetype == 'video/mp4'
+    assert os.path.exists(request.data_file.name)
+    assert request.data_file.read() == content
+    request.close()
+
+
+def test_binary_data(base_test_provider_class, mocker):
+    from tesla_ce_provider.models import base
+
+    content = os.urandom(512)
+    sample = base.Sample({'sample': {'data': {'data': content, 'metadata': {'mimetype': 'image/jpeg'}}}})
+    assert sample.data_bytes == content
+
+    # Binary data is encoded as a data URL only once
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(content).decode('utf-8')
+    encode = mocker.spy(base.binascii, 'b2a_base64')
+    assert sample.data == data_url
+    assert sample.data is sample.data
+    assert encode.call_count == 1
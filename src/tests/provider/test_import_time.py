@@ -0,0 +1,59 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for the import time of the package """
+import os
+import subprocess
+import sys
+
+# Maximum cumulative import time allowed for the result module, in microseconds
+IMPORT_TIME_BUDGET = int(os.getenv('IMPORT_TIME_BUDGET', 100000))
+
+
+def test_result_import_time():
+    import tesla_ce_provider
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(tesla_ce_provider.__file__)), env.get('PYTHONPATH', '')]
+    )
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import tesla_ce_provider.provider.result'],
+                            env=env, capture_output=True, text=True, check=True).stderr
+
+    # Lines have the format "import time: self [us] | cumulative | imported package"
+    times = {}
+    for line in output.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+
+    # Celery, the TeSLA CE client and the storage dependencies are not loaded
+    for module in ['celery', 'tesla_ce_client', 'requests', 'numpy', 'tesla_ce_provider.celery_app']:
+        assert module not in times
+    assert times['tesla_ce_provider.provider.result'] < IMPORT_TIME_BUDGET
+
+
+def test_models_import():
+    import tesla_ce_provider
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(tesla_ce_provider.__file__)), env.get('PYTHONPATH', '')]
+    )
+    modules = subprocess.run([sys.executable, '-c', 'import sys, tesla_ce_provider.models; print(list(sys.modules))'],
+                             env=env, capture_output=True, text=True, check=True).stdout
+
+    # Models do not load the storage access dependencies
+    for module in ['requests', 'tesla_ce_provider.storage']:
+        assert repr(module) not in modules
@@ -0,0 +1,71 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for the shared provider registry """
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_shared_provider(base_test_provider_class, mocker):
+    from tesla_ce_provider.provider import get_provider, get_provider_footprint, reset_provider
+
+    mocker.patch.dict('os.environ', {'PROVIDER_CLASS': 'tesla_ce_provider.BaseProvider'})
+    reset_provider()
+    assert get_provider_footprint() is None
+
+    # Concurrent first accesses create a single instance
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        providers = list(executor.map(lambda _: get_provider(), range(8)))
+    assert all(provider is providers[0] for provider in providers)
+
+    footprint = get_provider_footprint()
+    assert footprint['class'] == 'tesla_ce_provider.provider.base.BaseProvider'
+    assert footprint['memory'] >= 0
+    reset_provider()
+
+
+def test_preload_provider(base_test_provider_class, mocker):
+    from tesla_ce_provider import BaseProvider
+    from tesla_ce_provider.provider import get_provider, get_provider_footprint, reset_provider
+    from tesla_ce_provider.provider.registry import preload_provider
+
+    class PreloadedProvider(BaseProvider):
+        resources = None
+
+        @classmethod
+        def preload(cls):
+            cls.resources = 'resources'
+
+    mocker.patch.object(BaseProvider, 'get_provider_class', return_value=PreloadedProvider)
+    freeze = mocker.patch('gc.freeze')
+    reset_provider()
+
+    # Resources are loaded and the shared instance is created before forking
+    assert preload_provider() >= 0
+    assert PreloadedProvider.resources == 'resources'
+    assert get_provider_footprint()['class'].endswith('PreloadedProvider')
+    provider = get_provider()
+    assert isinstance(provider, PreloadedProvider)
+    freeze.assert_called_once()
+
+    # Preloaded instance is the one used by tasks
+    assert get_provider() is provider
+    reset_provider()
+
+    # Only resources are loaded when the instance is not preloaded
+    mocker.patch.dict('os.environ', {'PROVIDER_PRELOAD_INSTANCE': '0'})
+    PreloadedProvider.resources = None
+    preload_provider()
+    assert PreloadedProvider.resources == 'resources'
+    assert get_provider_footprint() is None
+    reset_provider()
@@ -0,0 +1,69 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for arrays shared between provider processes """
+import multiprocessing
+import os
+import pytest
+
+
+def _attach(directory, queue):
+    from tesla_ce_provider.shared_arrays import SharedArrayStore
+    store = SharedArrayStore(directory)
+    array = store.get('weights', lambda: None)
+    queue.put(float(array.sum()))
+    store.release('weights')
+
+
+def test_shared_arrays(base_test_provider_class, tmp_path):
+    numpy = pytest.importorskip('numpy')
+    from tesla_ce_provider.shared_arrays import SharedArrayStore
+
+    store = SharedArrayStore(str(tmp_path))
+    array = store.get('weights', lambda: numpy.arange(1000, dtype=numpy.float32))
+    assert not array.flags.writeable
+    assert store.get('weights', lambda: None) is array
+    assert store.stats() == {'weights': 4000}
+
+    # Other processes attach to the published array without loading it
+    queue = multiprocessing.get_context('fork').Queue()
+    process = multiprocessing.get_context('fork').Process(target=_attach, args=(str(tmp_path), queue))
+    process.start()
+    assert queue.get(timeout=10) == float(array.sum())
+    process.join(10)
+
+    # Array is kept while this process references it, and removed with the last reference
+    assert os.path.exists(tmp_path.joinpath('weights.npy'))
+    del array
+    store.release('weights')
+    assert not os.path.exists(tmp_path.joinpath('weights.npy'))
+
+
+def test_provider_shared_arrays(base_test_provider_class, mocker, tmp_path):
+    numpy = pytest.importorskip('numpy')
+    from tesla_ce_provider import shared_arrays
+
+    mocker.patch.object(shared_arrays, '_store', shared_arrays.SharedArrayStore(str(tmp_path)))
+
+    class FaceProvider(base_test_provider_class):
+        pass
+
+    class VoiceProvider(base_test_provider_class):
+        pass
+
+    # Arrays with the same name published by different providers are not shared
+    face = FaceProvider.get_shared_array('weights', lambda: numpy.zeros(10))
+    voice = VoiceProvider().get_shared_array('weights', lambda: numpy.ones(10))
+    assert face.sum() == 0 and voice.sum() == 10
+    shared_arrays.release_shared_arrays()
@@ -0,0 +1,54 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for API rate limiting """
+import multiprocessing
+import time
+
+
+def _acquire(path, count):
+    from tesla_ce_provider.ratelimit import TokenBucket
+    bucket = TokenBucket(path, 20, 1)
+    for _ in range(count):
+        bucket.acquire()
+
+
+def test_shared_token_bucket(base_test_provider_class, tmp_path):
+    # Two processes share the budget of 20 calls per second
+    path = str(tmp_path.joinpath('endpoint.bucket'))
+    start = time.monotonic()
+    processes = [multiprocessing.get_context('fork').Process(target=_acquire, args=(path, 5)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+    assert time.monotonic() - start >= 0.4
+
+
+def test_rate_limited_proxy(base_test_provider_class, mocker, tmp_path):
+    from tesla_ce_provider.ratelimit import RateLimiter, RateLimitedProxy
+
+    mocker.patch.dict('os.environ', {'API_RATE_LIMIT_GET_MODEL': '1000'})
+    limiter = RateLimiter(str(tmp_path))
+    client = mocker.Mock()
+    client.enrolment.get_model.return_value = {'model': None}
+
+    provider = RateLimitedProxy(client, limiter, 'provider')
+    assert provider.enrolment.get_model(1, 'learner') == {'model': None}
+    provider.enrolment.unlock_model(1, 'learner', 'task')
+
+    # Only endpoints with budget are limited
+    assert limiter.stats() == {'get_model': {'calls': 1, 'delayed': 0, 'wait_time': 0.0}}
+    assert limiter.get_bucket('unlock_model') is None
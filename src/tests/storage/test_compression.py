@@ -0,0 +1,41 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for compressed storage objects """
+import os
+import simplejson
+
+
+def test_model_compression(base_test_provider_class, mocker):
+    from tesla_ce_provider.storage import decompress, encode_json, get_model_codec
+
+    model = {'features': [[0.5] * 128] * 10}
+
+    # Compression is disabled by default
+    assert get_model_codec() is None
+    content, codec = encode_json(model)
+    assert codec is None
+    assert simplejson.loads(decompress(content)) == model
+
+    for codec_name in ['gzip', 'deflate']:
+        mocker.patch.dict(os.environ, {'MODEL_COMPRESSION': codec_name, 'MODEL_COMPRESSION_THRESHOLD': '1024'})
+        content, codec = encode_json(model)
+        assert codec == codec_name
+        assert len(content) < 1024
+        assert simplejson.loads(decompress(content)) == model
+
+        # Small models are not compressed
+        content, codec = encode_json({'features': []})
+        assert codec is None
+        assert simplejson.loads(decompress(content)) == {'features': []}
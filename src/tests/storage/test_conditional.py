@@ -0,0 +1,56 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for conditional requests to storage """
+import os
+
+
+def test_conditional_request(base_test_provider_class, mocker, tmp_path):
+    from tesla_ce_provider.storage import fetch_payload, session
+
+    mocker.patch.dict(os.environ, {'STORAGE_CACHE_DIR': str(tmp_path)})
+    modified = mocker.Mock(status_code=200, headers={'ETag': '"v1"'}, content=b'{"data": 1}')
+    not_modified = mocker.Mock(status_code=304, headers={}, content=b'')
+    fetch = mocker.patch('tesla_ce_provider.storage.session.fetch', side_effect=[modified, not_modified])
+
+    assert session.fetch_json('https://storage/object?signature=1') == {'data': 1}
+    assert fetch.call_args.kwargs['headers'] == {}
+
+    # Signed URL changes, but the object is the same and storage answers that it was not modified
+    assert session.fetch_json('https://storage/object?signature=2') == {'data': 1}
+    assert fetch.call_args.kwargs['headers'] == {'If-None-Match': '"v1"'}
+
+    # Sample and request payloads are not kept
+    payload = mocker.Mock(status_code=200, headers={'ETag': '"v1"', 'Content-Type': 'application/json'},
+                          content=b'{"data": "data:text/plain;base64,"}')
+    fetch.side_effect = [payload]
+    assert fetch_payload('https://storage/payload?signature=1') == {'data': 'data:text/plain;base64,'}
+    assert fetch.call_args.kwargs.get('headers') is None
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.object')]) == 1
+
+
+def test_conditional_eviction(base_test_provider_class, mocker, tmp_path):
+    from tesla_ce_provider.storage import conditional, files
+
+    evict = mocker.patch('tesla_ce_provider.storage.files.evict', wraps=files.evict)
+    cache = conditional.ConditionalCache(str(tmp_path), 400)
+
+    # Directory is scanned once to know its size, and then only when the budget is exceeded
+    cache.put('https://storage/object1', {'ETag': '"v1"'}, b'a' * 50)
+    cache.put('https://storage/object2', {'ETag': '"v1"'}, b'a' * 50)
+    assert evict.call_count == 1
+    cache.put('https://storage/object3', {'ETag': '"v1"'}, b'a' * 300)
+    assert evict.call_count == 2
+    assert cache.get_object('https://storage/object1') is None
+    assert cache.get_object('https://storage/object3') is not None
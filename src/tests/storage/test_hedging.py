@@ -0,0 +1,65 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for hedged storage requests and circuit breaker """
+import threading
+import pytest
+import requests
+
+
+def test_circuit_breaker(base_test_provider_class, mocker):
+    from tesla_ce_provider.storage import StorageException, StorageUnavailableException, fetch_guarded, \
+        get_host_stats
+
+    mocker.patch.dict('os.environ', {'STORAGE_BREAKER_FAILURES': '2', 'STORAGE_BREAKER_RESET': '60'})
+    url = 'http://breaker.storage/bucket/object'
+
+    # Client errors do not open the circuit
+    fetch = mocker.Mock(side_effect=[StorageException(url, 404), requests.ConnectionError(),
+                                     StorageException(url, 503)])
+    for _ in range(3):
+        with pytest.raises((StorageException, requests.ConnectionError)):
+            fetch_guarded(fetch, url)
+    assert get_host_stats()['breaker.storage']['open']
+
+    # Requests are refused while the circuit is open
+    with pytest.raises(StorageUnavailableException):
+        fetch_guarded(fetch, url)
+    assert fetch.call_count == 3
+    assert get_host_stats()['breaker.storage']['rejected'] == 1
+
+
+def test_hedged_request(base_test_provider_class, mocker):
+    from tesla_ce_provider.storage import fetch_guarded, get_host_stats
+    from tesla_ce_provider.storage.hedging import get_host_state
+
+    mocker.patch.dict('os.environ', {'STORAGE_HEDGING': '1', 'STORAGE_HEDGE_MIN_SAMPLES': '1'})
+    url = 'http://hedging.storage/bucket/object'
+    get_host_state(url).on_success(0.01)
+
+    # First request stalls until the hedged one has answered
+    answered = threading.Event()
+    calls = []
+
+    def fetch(fetch_url):
+        calls.append(fetch_url)
+        if len(calls) == 1:
+            answered.wait(5)
+            return 'slow'
+        answered.set()
+        return 'fast'
+
+    assert fetch_guarded(fetch, url) == 'fast'
+    assert get_host_stats()['hedging.storage']['hedged'] == 1
+    assert get_host_stats()['hedging.storage']['hedge_wins'] == 1
@@ -0,0 +1,44 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for node-level model store """
+import gzip
+import os
+import time
+
+
+def test_model_store(base_test_provider_class, tmp_path):
+    from tesla_ce_provider.storage import ModelStore
+
+    store = ModelStore(str(tmp_path), 50)
+    store.put('https://storage/model1', 'v1', b'{"model": 1, "data": "aaaa"}')
+    assert store.get('https://storage/model1', 'v1') == ({'model': 1, 'data': 'aaaa'}, 28)
+    assert store.get('https://storage/model1', 'v2') is None
+
+    # New versions replace previous ones
+    store.put('https://storage/model1', 'v2', b'{"model": 2}')
+    assert store.get('https://storage/model1', 'v1') is None
+    assert store.get('https://storage/model1', 'v2') == ({'model': 2}, 12)
+
+    # Least recently used models are removed when the budget is exceeded
+    past = time.time() - 60
+    for entry in os.scandir(str(tmp_path)):
+        os.utime(entry.path, (past, past))
+    store.put('https://storage/model2', 'v1', b'{"model": 3, "data": "bbbbbbbbbbbbbbbbbbbbbb"}')
+    assert store.get('https://storage/model1', 'v2') is None
+    assert store.get('https://storage/model2', 'v1') is not None
+
+    # Compressed models are decompressed from the mapped file
+    store.put('https://storage/model3', 'v1', gzip.compress(b'{"model": 4}'))
+    assert store.get('https://storage/model3', 'v1') == ({'model': 4}, 12)
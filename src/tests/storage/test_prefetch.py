@@ -0,0 +1,41 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for concurrent prefetch of storage objects """
+import random
+import threading
+import time
+
+
+def test_prefetch_order_and_window(base_test_provider_class):
+    from tesla_ce_provider.storage import prefetch
+
+    lock = threading.Lock()
+    state = {'loaded': 0, 'consumed': 0, 'max_ahead': 0}
+
+    def load(item):
+        time.sleep(random.random() / 100)
+        with lock:
+            state['loaded'] += 1
+            state['max_ahead'] = max(state['max_ahead'], state['loaded'] - state['consumed'])
+        return item * 2
+
+    results = []
+    for value in prefetch(range(20), load, window=3, workers=2):
+        with lock:
+            state['consumed'] += 1
+        results.append(value)
+
+    assert results == [item * 2 for item in range(20)]
+    assert state['max_ahead'] <= 4
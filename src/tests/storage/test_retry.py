@@ -0,0 +1,47 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for inline storage retries """
+import pytest
+import requests
+
+
+def test_fetch_with_retry(base_test_provider_class, mocker):
+    from tesla_ce_provider.storage import StorageException, fetch_with_retry, get_retry_stats
+
+    mocker.patch.dict('os.environ', {'STORAGE_RETRY_ATTEMPTS': '2', 'STORAGE_RETRY_STATUS': '503'})
+    sleep = mocker.patch('tesla_ce_provider.storage.retry.time.sleep')
+    stats = get_retry_stats()
+
+    # Transient errors are retried in process
+    fetch = mocker.Mock(side_effect=[StorageException('url', 503), requests.ConnectionError(), {'data': 1}])
+    assert fetch_with_retry(fetch, 'url') == {'data': 1}
+    assert sleep.call_count == 2
+
+    # Other status codes are raised at once
+    fetch = mocker.Mock(side_effect=StorageException('url', 404))
+    with pytest.raises(StorageException):
+        fetch_with_retry(fetch, 'url')
+    assert fetch.call_count == 1
+
+    # Last error is raised when retries are exhausted
+    fetch = mocker.Mock(side_effect=requests.Timeout())
+    with pytest.raises(StorageException):
+        fetch_with_retry(fetch, 'url')
+    assert fetch.call_count == 3
+
+    new_stats = get_retry_stats()
+    assert new_stats['retries'] - stats['retries'] == 4
+    assert new_stats['recovered'] - stats['recovered'] == 1
+    assert new_stats['exhausted'] - stats['exhausted'] == 1
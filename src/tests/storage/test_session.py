@@ -0,0 +1,47 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for pooled storage sessions """
+import os
+
+
+def test_session_per_process(base_test_provider_class, mocker):
+    from tesla_ce_provider import storage
+
+    storage.reset_session()
+    session = storage.get_session()
+
+    # Same process reuses the pooled session
+    assert storage.get_session() is session
+
+    # A forked child never reuses the session of its parent
+    mocker.patch('os.getpid', return_value=os.getpid() + 1)
+    child_session = storage.get_session()
+    assert child_session is not session
+    assert storage.get_session() is child_session
+
+
+def test_session_configuration(base_test_provider_class, mocker):
+    from tesla_ce_provider import storage
+
+    mocker.patch.dict(os.environ, {'STORAGE_POOL_SIZE': '3', 'STORAGE_KEEP_ALIVE': '0', 'SSL_VERIFY': '0',
+                                   'STORAGE_CONNECT_TIMEOUT': '1', 'STORAGE_READ_TIMEOUT': '2'})
+    storage.reset_session()
+    session = storage.get_session()
+
+    assert session.get_adapter('https://storage').poolmanager.connection_pool_kw['maxsize'] == 3
+    assert session.headers['Connection'] == 'close'
+    assert session.verify is False
+    assert storage.get_timeout() == (1.0, 2.0)
+    storage.reset_session()
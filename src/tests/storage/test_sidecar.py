@@ -0,0 +1,52 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for binary payload transport """
+import gzip
+import os
+import simplejson
+
+
+def test_decode_binary_payloads(base_test_provider_class, mocker):
+    from tesla_ce_provider.storage import decode_payload, load_sidecar
+
+    content = os.urandom(1024)
+    envelope = simplejson.dumps({'metadata': {'context': {}}, 'instruments': [1]}).encode('utf-8')
+    body = b'--sep\r\nContent-Type: application/json\r\n\r\n' + envelope + \
+           b'\r\n--sep\r\nContent-Disposition: form-data; name="data"\r\nContent-Type: image/png\r\n\r\n' + \
+           content + b'\r\n--sep--\r\n'
+
+    payload = decode_payload(body, 'multipart/mixed; boundary=sep')
+    assert payload['data'] == content
+    assert payload['metadata']['mimetype'] == 'image/png'
+    assert payload['instruments'] == [1]
+
+    payload = decode_payload(content, 'audio/wav')
+    assert payload == {'data': content, 'metadata': {'mimetype': 'audio/wav'}}
+
+    assert decode_payload(b'{"data": "data:,abc"}', 'application/octet-stream') == {'data': 'data:,abc'}
+
+    # Binary data in a separate object, relative to the envelope
+    fetch = mocker.patch('tesla_ce_provider.storage.sidecar.fetch_typed', return_value=(content, 'video/webm'))
+    payload = load_sidecar('http://storage/bucket/sample.json?sig=1', {'data_object': 'sample.webm', 'metadata': {}})
+    fetch.assert_called_once_with('http://storage/bucket/sample.webm?sig=1')
+    assert payload == {'data': content, 'metadata': {'mimetype': 'video/webm'}}
+
+    # Signed URLs of the data object are used unchanged
+    load_sidecar('http://storage/bucket/sample.json?sig=1', {'data_object': 'http://storage/bucket/sample.webm?sig=2'})
+    fetch.assert_called_with('http://storage/bucket/sample.webm?sig=2')
+
+    # Binary data looking like compressed content is not decompressed
+    for data in [b'\x78\x9c' + content, gzip.compress(content)]:
+        assert decode_payload(data, 'application/octet-stream') == {'data': data}
@@ -0,0 +1,38 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for streaming decode of storage payloads """
+import base64
+import os
+import simplejson
+
+
+def test_decode_stream(base_test_provider_class):
+    from tesla_ce_provider.storage import decode_stream, StreamedData
+
+    payload = {
+        'metadata': {'mimetype': 'image/png', 'context': {'data': 'not extracted'}},
+        'data': 'data:image/png;base64,' + base64.b64encode(os.urandom(1000)).decode('utf-8'),
+        'instruments': [1, 2],
+    }
+    for content in [simplejson.dumps(payload), simplejson.dumps(payload, indent=2).replace('/', '\\/')]:
+        content = content.encode('utf-8')
+        # Split the document in small chunks, so tokens and escape sequences are split between chunks
+        chunks = [content[pos:pos + 7] for pos in range(0, len(content), 7)]
+        result = decode_stream(chunks)
+
+        assert isinstance(result['data'], StreamedData)
+        assert result['data'].decode() == payload['data']
+        assert result['metadata'] == payload['metadata']
+        assert result['instruments'] == payload['instruments']
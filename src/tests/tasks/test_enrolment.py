@@ -0,0 +1,108 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for enrolment tasks """
+import pytest
+
+
+@pytest.fixture
+def enrolment_task(tesla_ce_task_client, mocker):
+    from tesla_ce_provider import BaseProvider
+    from tesla_ce_provider.provider.result import EnrolmentResult
+    from tesla_ce_provider.tasks import EnrolmentTask
+
+    class TestProvider(BaseProvider):
+        def enrol(self, samples, model=None):
+            return EnrolmentResult({'samples': [sample.data for sample in samples]}, 100, True)
+
+    mocker.patch.multiple(EnrolmentTask, _provider=TestProvider(), _provider_metadata=None)
+    mocker.patch.dict('os.environ', {'STORAGE_RETRY_ATTEMPTS': '1', 'STORAGE_RETRY_BACKOFF': '0'})
+    tesla_ce_task_client.provider.enrolment.get_model_lock.side_effect = lambda *args: {'model': None}
+    tesla_ce_task_client.provider.enrolment.get_available_samples.side_effect = lambda provider_id, learner_id: {
+        'count': 1,
+        'results': [{'id': 1, 'learner_id': learner_id, 'data': 'https://enrolment-storage/sample'}]
+    }
+    tesla_ce_task_client.provider.enrolment.get_sample_validation_list.return_value = {'results': []}
+    tesla_ce_task_client.get_next.return_value = None
+
+    return EnrolmentTask
+
+
+def test_sample_download_retry(enrolment_task, tesla_ce_task_client, mocker):
+    from celery.exceptions import Retry
+    from tesla_ce_provider.storage import StorageException
+
+    errors = []
+
+    def fetch_failing(url):
+        if len(errors) < failures:
+            errors.append(url)
+            raise StorageException(url, 503)
+        return {'data': 'data:text/plain;base64,'}
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_failing)
+
+    # Transient errors are retried in process, and the enrolment is completed
+    failures = 1
+    enrolment_task('learner')
+    model = tesla_ce_task_client.provider.enrolment.save_model.call_args[0][3]
+    assert model['model'] == {'samples': ['data:text/plain;base64,']}
+
+    # Once inline retries are exhausted, the task is rescheduled and the model is unlocked
+    errors.clear()
+    failures = 2
+    rescheduled = enrolment_task.get_retry_stats()['rescheduled']
+    with pytest.raises(Retry):
+        enrolment_task('learner')
+    assert len(errors) == 2
+    assert enrolment_task.get_retry_stats()['rescheduled'] == rescheduled + 1
+    tesla_ce_task_client.provider.enrolment.unlock_model.assert_called_once()
+
+
+def test_storage_unavailable(enrolment_task, tesla_ce_task_client, mocker):
+    from celery.exceptions import Reject
+    from tesla_ce_provider.storage import StorageUnavailableException
+
+    def fetch_unavailable(url):
+        raise StorageUnavailableException(url, 'enrolment-storage')
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_unavailable)
+    capture = mocker.patch.object(enrolment_task, 'capture_exception')
+
+    # Task fails fast when storage is not available while the provider reads the samples
+    with pytest.raises(Reject) as reject:
+        enrolment_task('learner')
+    assert str(reject.value.reason).startswith('PROVIDER_EXTERNAL_SERVICE_DOWN')
+    capture.assert_not_called()
+    tesla_ce_task_client.provider.enrolment.unlock_model.assert_called_once()
+
+
+def test_compressed_model(enrolment_task, tesla_ce_task_client, mocker):
+    from tesla_ce_provider.storage import decompress
+
+    def fetch_payload(url):
+        return {'data': 'data:text/plain;base64,'}
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_payload)
+    upload = mocker.patch('tesla_ce_provider.tasks.base.upload', return_value=mocker.Mock(status_code=204))
+    limiter = mocker.Mock()
+    mocker.patch('tesla_ce_provider.tasks.base.get_rate_limiter', return_value=limiter)
+    tesla_ce_task_client.provider.enrolment.get_model_lock.side_effect = lambda *args: {
+        'model': None, 'model_upload_url': {'url': 'https://model-storage/', 'fields': {}}
+    }
+    mocker.patch.dict('os.environ', {'MODEL_COMPRESSION': 'gzip', 'MODEL_COMPRESSION_THRESHOLD': '1'})
+
+    # Compressed model data is uploaded, and the model metadata is updated with the budget of save_model
+    enrolment_task('learner')
+    tesla_ce_task_client.provider.enrolment.save_model.assert_not_called()
+    assert decompress(upload.call_args[0][1]) == b'{"samples": ["data:text/plain;base64,"]}'
+    limiter.acquire.assert_any_call('save_model')
+    assert tesla_ce_task_client._connector.put.call_args[1]['body']['percentage'] == 100
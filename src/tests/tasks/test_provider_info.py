@@ -0,0 +1,36 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for provider information of tasks """
+
+
+def test_provider_info_shared(tesla_ce_task_client, mocker):
+    from tesla_ce_provider import BaseProvider
+    from tesla_ce_provider.tasks import EnrolmentTask, ValidationTask, VerificationTask
+
+    tasks = [EnrolmentTask, ValidationTask, VerificationTask]
+    for task in tasks:
+        mocker.patch.multiple(task, _provider=BaseProvider(), _provider_metadata=None)
+
+    # Provider information is requested once for all the task types
+    for task in tasks:
+        assert task.provider.info['acronym'] == 'test'
+        assert task.get_provider_options() is None
+    assert tesla_ce_task_client.provider.get.call_count == 1
+
+    # Information is requested again once invalidated
+    VerificationTask.invalidate_provider_metadata()
+    for task in tasks:
+        assert task.provider.instrument['acronym'] == 'fr'
+    assert tesla_ce_task_client.provider.get.call_count == 2
@@ -0,0 +1,116 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for enrolment samples of tasks """
+import copy
+import pytest
+
+
+def _get_pages(client, pages):
+    """
+        Configure the client to return the given pages of samples
+    """
+    results = [{'count': sum(len(page) for page in pages), 'results': [
+        {'id': sample_id, 'learner_id': 'learner', 'data': 'https://storage/{}'.format(sample_id)} for sample_id in page
+    ], 'page': index} for index, page in enumerate(pages)]
+    client.provider.enrolment.get_available_samples.side_effect = lambda provider_id, learner_id: copy.deepcopy(
+        results[0])
+    client.provider.enrolment.get_sample_validation_list.return_value = {'results': []}
+    client.get_next.side_effect = lambda page: copy.deepcopy(
+        results[page['page'] + 1]) if page['page'] + 1 < len(results) else None
+
+
+@pytest.mark.parametrize('pipelined', ['0', '1'])
+def test_sample_pages(tesla_ce_task_client, mocker, pipelined):
+    from tesla_ce_provider.tasks import EnrolmentTask
+
+    mocker.patch.dict('os.environ', {'ENROLMENT_PREFETCH_PAGES': pipelined})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: {'data': url})
+    _get_pages(tesla_ce_task_client, [[1, 2], [3, 4], [5]])
+
+    # Samples keep the order of the pages
+    samples = EnrolmentTask.get_validated_enrolment_samples('learner')
+    assert [sample.sample_id for sample in samples] == [1, 2, 3, 4, 5]
+
+    # Pages after the one being consumed are not requested when enrolment stops early
+    mocker.patch.dict('os.environ', {'ENROLMENT_PREFETCH_WINDOW': '1'})
+    tesla_ce_task_client.get_next.reset_mock()
+    samples = EnrolmentTask.get_validated_enrolment_samples('learner')
+    assert next(samples).sample_id == 1
+    samples.close()
+    assert tesla_ce_task_client.get_next.call_count <= int(pipelined)
+
+
+@pytest.mark.parametrize('pipelined', ['0', '1'])
+def test_validation_download_failure(tesla_ce_task_client, mocker, pipelined):
+    from celery.exceptions import Retry
+    from tesla_ce_provider.storage import StorageException
+    from tesla_ce_provider.tasks import EnrolmentTask
+
+    def fetch_missing(url):
+        raise StorageException(url, 404)
+
+    mocker.patch.dict('os.environ', {'ENROLMENT_PREFETCH_PAGES': pipelined})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: {'data': url})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_json', new=fetch_missing)
+    _get_pages(tesla_ce_task_client, [[1, 2]])
+    tesla_ce_task_client.provider.enrolment.get_sample_validation_list.return_value = {
+        'results': [{'info': 'https://storage/validation'}]
+    }
+
+    # Task is scheduled for retry when validation information is not available
+    with pytest.raises(Retry):
+        list(EnrolmentTask.get_validated_enrolment_samples('learner'))
+
+
+def test_streamed_payloads_not_shared(tesla_ce_task_client, mocker):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from tesla_ce_provider.tasks import base
+
+    # Both downloads must be in progress at the same time, which is not possible if they are shared
+    both_started = threading.Barrier(2)
+
+    def fetch_streamed(url):
+        both_started.wait(5)
+        return {'data': object()}
+
+    mocker.patch.dict('os.environ', {'STORAGE_SPOOL_THRESHOLD': '1'})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_streamed)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        payloads = list(executor.map(base._fetch_payload_shared, ['https://storage/sample?sig=1'] * 2))
+    assert payloads[0]['data'] is not payloads[1]['data']
+
+
+def test_pipelined_validations(tesla_ce_task_client, mocker):
+    import threading
+    from tesla_ce_provider.tasks import EnrolmentTask
+
+    mocker.patch.dict('os.environ', {'ENROLMENT_PREFETCH_PAGES': '1'})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: {'data': url})
+    _get_pages(tesla_ce_task_client, [[1, 2], [3, 4], [5]])
+    threads = []
+    load_page_validations = type(EnrolmentTask)._load_page_validations
+
+    def load_validations(samples):
+        threads.append(threading.current_thread().name)
+        load_page_validations(EnrolmentTask, samples)
+    mocker.patch.object(EnrolmentTask, '_load_page_validations', new=load_validations)
+
+    # Validations of next pages are loaded on background, together with the page
+    samples = EnrolmentTask.get_validated_enrolment_samples('learner')
+    assert [sample.sample_id for sample in samples] == [1, 2, 3, 4, 5]
+    assert threads[0] == threading.current_thread().name
+    assert len(threads) == 3
+    assert all(thread.startswith('tesla_ce_pages') for thread in threads[1:])
@@ -0,0 +1,146 @@
+#  Copyright (c) 2020 Xavier Baró
+#
+#      This program is free software: you can redistribute it and/or modify
+#      it under the terms of the GNU Affero General Public License as
+#      published by the Free Software Foundation, either version 3 of the
+#      License, or (at your option) any later version.
+#
+#      This program is distributed in the hope that it will be useful,
+#      but WITHOUT ANY WARRANTY; without even the implied warranty of
+#      MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#      GNU Affero General Public License for more details.
+#
+#      You should have received a copy of the GNU Affero General Public License
+#      along with this program.  If not, see <https://www.gnu.org/licenses/>.
+""" Test module for verification tasks """
+import pytest
+
+
+def _get_provider(**methods):
+    """
+        Create a provider instance with the given methods
+    """
+    from tesla_ce_provider import BaseProvider
+
+    return type('TestProvider', (BaseProvider, ), methods)()
+
+
+@pytest.fixture
+def verification_task(tesla_ce_task_client, mocker):
+    from tesla_ce_provider.tasks import VerificationTask
+
+    tesla_ce_task_client.provider.verification.get_provider_request_result.return_value = {
+        'learner_id': 'learner',
+        'request': {'data': 'https://verification-storage/request'}
+    }
+    tesla_ce_task_client.provider.enrolment.get_model.return_value = {
+        'can_analyse': True,
+        'model': 'https://verification-storage/model',
+        'version': 1
+    }
+    mocker.patch.object(VerificationTask, 'get_model_data', return_value={})
+
+    return VerificationTask
+
+
+def test_request_download_failure(verification_task, tesla_ce_task_client, mocker):
+    from celery.exceptions import Reject, Retry
+    from tesla_ce_provider.provider.result import VerificationResult
+    from tesla_ce_provider.storage import StorageException, StorageUnavailableException
+
+    verify = mocker.Mock(return_value=VerificationResult(True))
+    provider = _get_provider(verify=lambda self, request, model: verify(request, model))
+    mocker.patch.multiple(verification_task, _provider=provider, _provider_metadata=None)
+
+    # Task is scheduled for retry when the background download of the request fails
+    def fetch_missing(url):
+        raise StorageException(url, 404)
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_missing)
+    with pytest.raises(Retry):
+        verification_task(1, 2)
+    verify.assert_not_called()
+
+    # Task is rejected with an error result when storage is not available
+    def fetch_unavailable(url):
+        raise StorageUnavailableException(url, 'verification-storage')
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=fetch_unavailable)
+    with pytest.raises(Reject) as reject:
+        verification_task(1, 2)
+    assert 'PROVIDER_EXTERNAL_SERVICE_DOWN' in str(reject.value.reason)
+    verify.assert_not_called()
+    result = tesla_ce_task_client.provider.verification.set_provider_request_result.call_args[0][2]
+    assert result['message_code'] == 'PROVIDER_EXTERNAL_SERVICE_DOWN'
+
+
+def test_precheck_result(verification_task, tesla_ce_task_client, mocker):
+    from tesla_ce_provider.provider.result import VerificationResult
+
+    verify = mocker.Mock(return_value=VerificationResult(True))
+    provider = _get_provider(precheck=lambda self, request: VerificationResult(False, error_message='Black image'),
+                             verify=lambda self, request, model: verify(request, model))
+    mocker.patch.multiple(verification_task, _provider=provider, _provider_metadata=None)
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: {'data': 'data:text/plain;base64,'})
+
+    # Result of the pre-check is stored without loading the model
+    verification_task(1, 2)
+    tesla_ce_task_client.provider.enrolment.get_model.assert_not_called()
+    verification_task.get_model_data.assert_not_called()
+    verify.assert_not_called()
+    result = tesla_ce_task_client.provider.verification.set_provider_request_result.call_args[0][2]
+    assert result['error_message'] == 'Black image'
+
+
+def test_request_closed(verification_task, tesla_ce_task_client, mocker):
+    from tesla_ce_provider.models.base import Request
+    from tesla_ce_provider.provider.result import VerificationResult
+
+    requests = []
+    provider = _get_provider(precheck=lambda self, request: requests.append(request),
+                             verify=lambda self, request, model: requests.append(request) or VerificationResult(True))
+    mocker.patch.multiple(verification_task, _provider=provider, _provider_metadata=None)
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: {'data': 'data:text/plain;base64,'})
+    close = mocker.patch.object(Request, 'close', autospec=True)
+
+    # Pre-check and verification receive the same request, which is closed once the task is done
+    verification_task(1, 2)
+    assert len(requests) == 2
+    assert requests[0] is requests[1]
+    close.assert_called_once_with(requests[0])
+
+
+def test_request_not_downloaded_without_model(verification_task, tesla_ce_task_client, mocker):
+    import threading
+    from celery.exceptions import Reject, Retry
+    from tesla_ce_provider.storage import StreamedData
+
+    mocker.patch.multiple(verification_task, _provider=_get_provider(), _provider_metadata=None)
+    fetch = mocker.Mock(return_value={'data': 'data:text/plain;base64,'})
+    mocker.patch('tesla_ce_provider.tasks.base.fetch_payload', new=lambda url: fetch(url))
+
+    # Request is not downloaded when the model cannot be used yet
+    tesla_ce_task_client.provider.enrolment.get_model.return_value = {'can_analyse': False}
+    with pytest.raises(Retry):
+        verification_task(1, 2)
+    fetch.assert_not_called()
+
+    # Buffers of a request downloaded while the model data failed are released
+    download_started = threading.Event()
+    closed = threading.Event()
+    data = mocker.Mock(spec=StreamedData)
+    data.close.side_effect = closed.set
+
+    def fetch_started(url):
+        download_started.set()
+        return {'data': data}
+
+    def get_model_data(*args, **kwargs):
+        download_started.wait(5)
+        raise Reject('Model data not valid')
+
+    mocker.patch.dict('os.environ', {'STORAGE_SPOOL_THRESHOLD': '1'})
+    fetch.side_effect = fetch_started
+    verification_task.get_model_data.side_effect = get_model_data
+    tesla_ce_task_client.provider.enrolment.get_model.return_value = {'can_analyse': True, 'model': 'model'}
+    with pytest.raises(Reject):
+        verification_task(1, 2)
+    assert closed.wait(5)